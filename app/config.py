@@ -1,35 +1,59 @@
 # app_simple/config.py
 import os
-from typing import List
+from dataclasses import dataclass
+from typing import FrozenSet
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+@dataclass(frozen=True, slots=True)
 class Settings:
-    """Simple configuration management."""
-    
+    """Immutable configuration snapshot, parsed from the environment once."""
+
     # Telegram Configuration
-    telegram_token: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
-    
+    telegram_token: str
+
     # OpenAI Configuration
-    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
-    
+    openai_api_key: str
+
     # Database Configuration
-    mongo_uri: str = os.getenv("MONGO_URI", "")
-    mongo_db_name: str = os.getenv("MONGO_DB_NAME", "")
-    
+    mongo_uri: str
+    mongo_db_name: str
+
     # Security Configuration
-    @property
-    def allowed_user_ids(self) -> List[int]:
-        user_ids_str = os.getenv("ALLOWED_USER_IDS", "")
-        if not user_ids_str:
-            return []
-        return [int(uid.strip()) for uid in user_ids_str.split(',') if uid.strip()]
-    
+    allowed_user_ids: FrozenSet[int]
+
     # Optional Configuration
-    debug: bool = os.getenv("DEBUG", "false").lower() == "true"
-    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    debug: bool
+    log_level: str
+
+    # Concurrency cap for in-flight OpenAI requests (tune to account tier)
+    openai_max_concurrency: int
+
+    # Per-minute OpenAI quotas (requests/min and tokens/min)
+    openai_rpm: int
+    openai_tpm: int
+
+    @classmethod
+    def load(cls) -> 'Settings':
+        """Reads and parses the environment exactly once."""
+        return cls(
+            telegram_token=os.getenv("TELEGRAM_BOT_TOKEN", ""),
+            openai_api_key=os.getenv("OPENAI_API_KEY", ""),
+            mongo_uri=os.getenv("MONGO_URI", ""),
+            mongo_db_name=os.getenv("MONGO_DB_NAME", ""),
+            allowed_user_ids=frozenset(
+                int(uid.strip())
+                for uid in os.getenv("ALLOWED_USER_IDS", "").split(',')
+                if uid.strip()
+            ),
+            debug=os.getenv("DEBUG", "false").lower() == "true",
+            log_level=os.getenv("LOG_LEVEL", "INFO"),
+            openai_max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "20")),
+            openai_rpm=int(os.getenv("OPENAI_RPM", "500")),
+            openai_tpm=int(os.getenv("OPENAI_TPM", "90000")),
+        )
 
 # Global settings instance
-settings = Settings() 
\ No newline at end of file
+settings = Settings.load()
@@ -15,6 +15,10 @@ class Category(str, Enum):
     OTHER = "Other"
     UNCATEGORIZED = "Uncategorized"
 
+# Case-folded value -> member map so AI responses like "food & drinks" hit
+# the enum with one dict lookup instead of a linear scan (or a miss).
+CATEGORY_BY_VALUE_CI = {category.value.lower(): category for category in Category}
+
 class Currency(str, Enum):
     SGD = "SGD"
     USD = "USD"
@@ -35,7 +39,7 @@ class FilterType(str, Enum):
     KEYWORDS = "keywords"
     NONE = "none"
 
-@dataclass
+@dataclass(slots=True)
 class Transaction:
     """Transaction data model."""
     amount: float
@@ -50,8 +54,10 @@ class Transaction:
     
     def add_keywords(self, new_keywords: List[str]) -> None:
         """Add new keywords to the transaction."""
+        seen = set(self.keywords)
         for keyword in new_keywords:
-            if keyword not in self.keywords:
+            if keyword not in seen:
+                seen.add(keyword)
                 self.keywords.append(keyword)
     
     def get_first_keyword(self) -> Optional[str]:
@@ -79,32 +85,20 @@ class Transaction:
         """Create Transaction from dictionary."""
         if '_id' in data:
             data['id'] = str(data.pop('_id'))
-        
-        # Handle both new and old database schemas
-        if 'parsedData' in data:
-            # Old schema
-            parsed_data = data.get('parsedData', {})
-            return cls(
-                id=data.get('id'),
-                amount=parsed_data.get('amount', 0),
-                currency=Currency(parsed_data.get('currency', 'SGD')),
-                keywords=parsed_data.get('keywords', []),
-                category=Category(data.get('category', 'Uncategorized')),
-                raw_text=data.get('rawText', ''),
-                source=TransactionSource(data.get('source', 'text')),
-                image_url=data.get('imageUrl'),
-                created_at=data.get('createdAt', datetime.now())
-            )
-        else:
-            # New schema
-            return cls(
-                id=data.get('id'),
-                amount=data.get('amount', 0),
-                currency=Currency(data.get('currency', 'SGD')),
-                keywords=data.get('keywords', []),
-                category=Category(data.get('category', 'Uncategorized')),
-                raw_text=data.get('rawText', ''),
-                source=TransactionSource(data.get('source', 'text')),
-                image_url=data.get('imageUrl'),
-                created_at=data.get('createdAt', datetime.now())
-            ) 
\ No newline at end of file
+
+        # Handle both new and old database schemas: the old schema nests the
+        # amount/currency/keywords under parsedData, the new one is flat.
+        # Detect once and read from the right mapping; everything else is shared.
+        parsed_data = data.get('parsedData')
+        values = parsed_data if parsed_data is not None else data
+        return cls(
+            id=data.get('id'),
+            amount=values.get('amount', 0),
+            currency=Currency(values.get('currency', 'SGD')),
+            keywords=values.get('keywords', []),
+            category=Category(data.get('category', 'Uncategorized')),
+            raw_text=data.get('rawText', ''),
+            source=TransactionSource(data.get('source', 'text')),
+            image_url=data.get('imageUrl'),
+            created_at=data.get('createdAt', datetime.now())
+        ) 
\ No newline at end of file
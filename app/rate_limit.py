@@ -0,0 +1,76 @@
+# app_simple/rate_limit.py
+"""Token-bucket throttling for outbound Telegram calls.
+
+Telegram enforces roughly 30 messages/second globally and 1 message/second
+per chat; exceeding either returns 429 and the library's blind retry only
+amplifies the burst. Awaiting these buckets before each send queues the
+overflow locally instead of triggering the limit.
+"""
+import asyncio
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """Classic token bucket with monotonic-clock refill.
+
+    Capacity doubles as the burst size. acquire() sleeps exactly long enough
+    for the next token; waiters queue FIFO on the internal lock.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Waits until the requested tokens are available, then takes them."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class DualTokenBucket:
+    """Paired per-minute buckets for OpenAI's request and token quotas.
+
+    OpenAI meters requests/minute and tokens/minute separately; a call must
+    fit both budgets, so acquire() draws one request token plus a weighted
+    token estimate and waits on whichever bucket is shorter.
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        # Capacity is the full minute's quota so a single large prompt can
+        # always clear the bucket; refill is spread evenly per second
+        self._requests = TokenBucket(rpm / 60.0, rpm)
+        self._tokens = TokenBucket(tpm / 60.0, tpm)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Waits for one request slot plus the estimated completion tokens."""
+        await self._requests.acquire()
+        if tokens > 0:
+            await self._tokens.acquire(float(tokens))
+
+
+class TelegramRateLimiter:
+    """Combines the global bucket with a lazily-created per-chat bucket."""
+
+    def __init__(self, global_rate: float = 30.0, per_chat_rate: float = 1.0):
+        self._global = TokenBucket(global_rate, global_rate)
+        self._per_chat_rate = per_chat_rate
+        self._chats: Dict[int, TokenBucket] = {}
+
+    async def acquire(self, chat_id: int) -> None:
+        """Waits for both the per-chat and the global budget before a send."""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self._per_chat_rate, self._per_chat_rate)
+        await bucket.acquire()
+        await self._global.acquire()
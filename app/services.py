@@ -1,25 +1,51 @@
 # app/services.py
 import asyncio
-import json
+import logging
 import re
+from collections import OrderedDict
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
+from cachetools import TTLCache
+import httpx
+import orjson
 from openai import AsyncOpenAI
 import spacy
-from PIL import Image, ImageEnhance
+from PIL import Image, ImageFilter, ImageStat
 import pytesseract
 import io
 import os
+import threading
+
+# In-process Tesseract binding; optional, pytesseract remains the fallback
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
 
 from app.config import settings
-from app.models import Transaction, Category, Currency, TransactionSource, TimeFrame, FilterType
+from app.rate_limit import DualTokenBucket
+from app.models import Transaction, Category, Currency, TransactionSource, TimeFrame, FilterType, CATEGORY_BY_VALUE_CI
 from database import connection
 
+logger = logging.getLogger(__name__)
+
 # Windows Tesseract Configuration
 if os.name == 'nt':
     pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
+# Precompiled patterns for OCR post-processing (compiled once at import,
+# so the latency-sensitive image path skips re's per-call cache lookups)
+_AMOUNT_FULL_RE = re.compile(r"(?:SGD|S\$|\$)\s*(\d+(?:\.\d{1,2})?)", re.IGNORECASE)
+_AMOUNT_ANY_RE = re.compile(r"(\d+(?:\.\d{1,2})?)")
+_CAPS_RE = re.compile(r"\b([A-Z][A-Z\s]{2,})\b")
+_NOUN_RE = re.compile(r"\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b")
+
+# Recap-query heuristics (single word / "at <place>"), compiled once
+_SINGLE_WORD_RE = re.compile(r'\w+')
+_AT_X_RE = re.compile(r'\bat\s+\w+', re.IGNORECASE)
+
 # Common merchants for keyword matching
 COMMON_MERCHANTS = [
     "7-eleven", "starbucks", "mcdonald's", "kfc", "fairprice", "ntuc", 
@@ -29,25 +55,193 @@ COMMON_MERCHANTS = [
     "m1", "shopee", "lazada", "amazon"
 ]
 
+# Single alternation compiled once so merchant lookup is one linear scan of
+# the OCR text instead of one substring search per known merchant. Longest
+# names first so e.g. "ya kun kaya toast" wins over a shorter overlap.
+_MERCHANT_RE = re.compile(
+    "|".join(re.escape(m) for m in sorted(COMMON_MERCHANTS, key=len, reverse=True)),
+    re.IGNORECASE
+)
+
+# One OpenAI client per process, on an explicitly pooled HTTP/2 transport:
+# TLS sessions are kept alive across requests and concurrent calls multiplex
+# over one connection instead of re-handshaking per service instance.
+_OPENAI_HTTP_CLIENT = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+    timeout=httpx.Timeout(30.0)
+)
+_OPENAI_CLIENT = AsyncOpenAI(api_key=settings.openai_api_key, http_client=_OPENAI_HTTP_CLIENT)
+
+# Cap in-flight OpenAI requests below the account's rate limit; without a
+# gate a burst of updates turns into 429s and retry amplification
+_OPENAI_SEM = asyncio.Semaphore(settings.openai_max_concurrency)
+
+# The semaphore caps concurrency but not rate: a burst of fast completions
+# can still exhaust the per-minute RPM/TPM quota. Draw from these buckets
+# (weighted by a rough len//4 prompt-token estimate) before every call.
+_OPENAI_LIMITER = DualTokenBucket(settings.openai_rpm, settings.openai_tpm)
+
+
+def _estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Cheap prompt-token estimate: ~4 characters per token."""
+    return sum(len(m.get("content", "")) for m in messages) // 4
+
+# Static prompt prefixes, concatenated once at import; per call only the
+# short variable tail is appended
+_PARSING_PROMPT_PREFIX = (
+    "You are a query parsing expert. Analyze the user's request and extract information into a JSON object. "
+    "The JSON should have: 'action' ('summarize' or 'list'), 'timeframe' (day, today, week, this week, month, all), "
+    "'filter_type' (category, keywords, none), and 'filter_value' (the specific name or 'none'). "
+    "If the user asks to 'show', 'list', or 'see' transactions, the action is 'list'. Otherwise, it's 'summarize'. "
+
+    "IMPORTANT: For filter_type classification:\n"
+    "- Use 'category' ONLY for general spending categories like 'food', 'transport', 'shopping', 'entertainment', 'health', 'bills', 'groceries'\n"
+    "- Use 'keywords' for ANY specific names, places, brands, merchants, or single words that are not general categories\n"
+    "- Examples of keywords: 'starbucks', 'jem', 'ntuc', 'fairprice', 'grab', 'mala', 'coffee', 'lunch'\n"
+    "- Examples of categories: 'food', 'transport', 'shopping', 'groceries', 'entertainment'\n"
+    "- If unsure, default to 'keywords'\n\n"
+
+    "If the user says 'today', set timeframe to 'day'. If 'this week' or 'week', set timeframe to 'week'. "
+    "If 'this month' or 'month', set timeframe to 'month'. If 'all', set timeframe to 'all'.\n\n"
+)
+
+# Structured-output schema for the recap parse: the API guarantees a JSON
+# object with exactly these keys and enum values, so malformed-JSON retries
+# and defensive defaults never trigger
+_PARSING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "recap_query",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "enum": ["summarize", "list"]},
+                "timeframe": {
+                    "type": "string",
+                    "enum": ["day", "today", "week", "this week", "month", "all"],
+                },
+                "filter_type": {"type": "string", "enum": ["category", "keywords", "none"]},
+                "filter_value": {"type": "string"},
+            },
+            "required": ["action", "timeframe", "filter_type", "filter_value"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_SUMMARY_PROMPT_PREFIX = (
+    "You are a smart financial assistant who says only necessary information. "
+    "Based on the following JSON data, write a short, simple-easy-to-read summary. "
+    "Address the user's original query directly. Mention the total amount and number of transactions if relevant.\n\n"
+)
+
+async def close_openai_client() -> None:
+    """Close the shared OpenAI client and its HTTP pool (called at shutdown)."""
+    try:
+        await _OPENAI_CLIENT.close()
+        await _OPENAI_HTTP_CLIENT.aclose()
+    except Exception as e:
+        logger.error("Error closing OpenAI client: %s", e)
+
 class AIService:
     """Service for AI-related operations using OpenAI."""
     
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = _OPENAI_CLIENT
         self.categories = [cat.value for cat in Category]
-    
+        # Categorization system message is fully static; build it once
+        self._categorize_system_message = {
+            "role": "system",
+            "content": f"You are a helpful assistant that categorizes expenses. Respond with only one category from this list: {', '.join(self.categories)}"
+        }
+        # Merchant -> Category cache. Merchants repeat constantly, so most
+        # categorizations can skip the OpenAI round-trip entirely. LRU-bounded;
+        # evicted entries are still one cheap Mongo lookup away.
+        self._category_cache: "OrderedDict[str, Category]" = OrderedDict()
+        # Recent recap parses: the same question re-sent within a minute
+        # (suggestion taps) skips the parsing round-trip entirely
+        self._recap_parse_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
+
+    async def _chat_completion(self, **kwargs):
+        """chat.completions.create gated by the shared concurrency semaphore
+        and the per-minute RPM/TPM budget."""
+        await _OPENAI_LIMITER.acquire(_estimate_tokens(kwargs.get("messages", ())))
+        async with _OPENAI_SEM:
+            return await self.client.chat.completions.create(**kwargs)
+
+    def _remember_category(self, cache_key: str, category: Category) -> None:
+        """Insert into the in-memory LRU, evicting the oldest past the bound."""
+        self._category_cache[cache_key] = category
+        self._category_cache.move_to_end(cache_key)
+        while len(self._category_cache) > 1024:
+            self._category_cache.popitem(last=False)
+
+    async def warm_category_cache(self, limit: int = 512) -> None:
+        """Preload the in-memory LRU from the persistent merchant cache.
+
+        Run at startup so the first transaction for a known merchant is a
+        dict hit instead of a Mongo round-trip.
+        """
+        try:
+            if connection.merchant_category_cache is None:
+                return
+            docs = await connection.merchant_category_cache.find().to_list(length=limit)
+            for doc in docs:
+                try:
+                    self._remember_category(doc["_id"], Category(doc["category"]))
+                except (KeyError, ValueError):
+                    continue  # skip malformed or legacy entries
+            logger.info("Warmed category cache with %s merchants", len(docs))
+        except Exception as e:
+            logger.error("Category cache warm-up error: %s", e)
+
+    async def _get_cached_category(self, cache_key: str) -> Optional[Category]:
+        """Look up a previously categorized merchant (memory first, then DB)."""
+        category = self._category_cache.get(cache_key)
+        if category is not None:
+            self._category_cache.move_to_end(cache_key)
+            return category
+        try:
+            if connection.merchant_category_cache is not None:
+                doc = await connection.merchant_category_cache.find_one({"_id": cache_key})
+                if doc:
+                    category = Category(doc["category"])
+                    self._remember_category(cache_key, category)
+                    return category
+        except Exception as e:
+            logger.error("Category cache lookup error: %s", e)
+        return None
+
+    async def _store_cached_category(self, cache_key: str, category: Category) -> None:
+        """Remember a categorization so repeat merchants skip the AI call."""
+        self._remember_category(cache_key, category)
+        try:
+            if connection.merchant_category_cache is not None:
+                await connection.merchant_category_cache.update_one(
+                    {"_id": cache_key},
+                    {"$set": {"category": category.value}},
+                    upsert=True
+                )
+        except Exception as e:
+            logger.error("Category cache store error: %s", e)
+
     async def categorize_transaction(self, merchant: str, amount: float) -> Category:
         """Categorize a transaction based on merchant name and amount."""
+        cache_key = merchant.strip().lower()
+        cached = await self._get_cached_category(cache_key)
+        if cached is not None:
+            logger.info("Category cache hit for '%s': %s", merchant, cached.value)
+            return cached
+
         try:
-            print(f"Categorizing transaction at '{merchant}' for ${amount:.2f}")
-            
-            response = await self.client.chat.completions.create(
+            logger.info("Categorizing transaction at '%s' for $%.2f", merchant, amount)
+
+            response = await self._chat_completion(
                 model="gpt-3.5-turbo",
                 messages=[
-                    {
-                        "role": "system", 
-                        "content": f"You are a helpful assistant that categorizes expenses. Respond with only one category from this list: {', '.join(self.categories)}"
-                    },
+                    self._categorize_system_message,
                     {
                         "role": "user", 
                         "content": f"What is the category for a transaction of SGD {amount:.2f} at '{merchant}'?"
@@ -59,123 +253,256 @@ class AIService:
             )
             
             category_name = response.choices[0].message.content.strip()
-            print(f"AI suggested category: {category_name}")
-            
-            # Find the matching category enum
-            for category in Category:
-                if category.value == category_name:
-                    return category
+            logger.info("AI suggested category: %s", category_name)
             
+            # O(1), case-insensitive lookup of the matching category enum
+            category = CATEGORY_BY_VALUE_CI.get(category_name.lower())
+            if category is not None:
+                # Only confident answers are cached; misses fall through
+                # to OTHER and stay eligible for a future retry
+                await self._store_cached_category(cache_key, category)
+                return category
+
             return Category.OTHER
             
         except Exception as e:
-            print(f"OpenAI categorization error: {e}")
+            logger.error("OpenAI categorization error: %s", e)
             return Category.UNCATEGORIZED
-    
+
+    async def categorize_transactions_batch(self, pairs: List[Tuple[str, float]]) -> List[Category]:
+        """Categorize several (merchant, amount) pairs with a single AI call.
+
+        Amortizes the HTTP round-trip and prompt overhead across all items,
+        so bulk imports don't pay one OpenAI call per transaction. Cached
+        merchants are resolved locally and only the misses are sent.
+        """
+        if not pairs:
+            return []
+
+        results: List[Optional[Category]] = []
+        misses = []  # (index, merchant, amount)
+        for i, (merchant, amount) in enumerate(pairs):
+            cached = await self._get_cached_category(merchant.strip().lower())
+            results.append(cached)
+            if cached is None:
+                misses.append((i, merchant, amount))
+
+        if misses:
+            try:
+                items = "\n".join(
+                    f"{n + 1}. SGD {amount:.2f} at '{merchant}'"
+                    for n, (_, merchant, amount) in enumerate(misses)
+                )
+                response = await self._chat_completion(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": (
+                                "You are a helpful assistant that categorizes expenses. "
+                                f"Valid categories: {', '.join(self.categories)}. "
+                                "Respond with a JSON object {\"categories\": [...]} containing "
+                                "one category per numbered transaction, in order."
+                            )
+                        },
+                        {"role": "user", "content": f"Categorize these transactions:\n{items}"}
+                    ],
+                    temperature=0,
+                    response_format={"type": "json_object"},
+                    timeout=30
+                )
+                names = orjson.loads(response.choices[0].message.content).get("categories", [])
+            except Exception as e:
+                logger.error("OpenAI batch categorization error: %s", e)
+                names = []
+
+            for n, (i, merchant, _) in enumerate(misses):
+                category = Category.UNCATEGORIZED
+                if n < len(names):
+                    name = str(names[n]).strip()
+                    category = CATEGORY_BY_VALUE_CI.get(name.lower(), Category.OTHER)
+                if category not in (Category.OTHER, Category.UNCATEGORIZED):
+                    await self._store_cached_category(merchant.strip().lower(), category)
+                results[i] = category
+
+        return [c if c is not None else Category.UNCATEGORIZED for c in results]
+
     async def parse_recap_query(self, query_text: str) -> Dict[str, Any]:
         """Parse a natural language recap query into structured data."""
+        # Identical queries within a minute (keyboard taps, retries) reuse
+        # the parse verbatim; temperature=0 makes the call deterministic so
+        # the reuse is safe
+        cache_key = query_text.strip().lower()
+        cached = self._recap_parse_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Recap parse cache hit for '%s'", query_text)
+            return cached
         try:
-            parsing_prompt = (
-                "You are a query parsing expert. Analyze the user's request and extract information into a JSON object. "
-                "The JSON should have: 'action' ('summarize' or 'list'), 'timeframe' (day, today, week, this week, month, all), "
-                "'filter_type' (category, keywords, none), and 'filter_value' (the specific name or 'none'). "
-                "If the user asks to 'show', 'list', or 'see' transactions, the action is 'list'. Otherwise, it's 'summarize'. "
-                
-                "IMPORTANT: For filter_type classification:\n"
-                "- Use 'category' ONLY for general spending categories like 'food', 'transport', 'shopping', 'entertainment', 'health', 'bills', 'groceries'\n"
-                "- Use 'keywords' for ANY specific names, places, brands, merchants, or single words that are not general categories\n"
-                "- Examples of keywords: 'starbucks', 'jem', 'ntuc', 'fairprice', 'grab', 'mala', 'coffee', 'lunch'\n"
-                "- Examples of categories: 'food', 'transport', 'shopping', 'groceries', 'entertainment'\n"
-                "- If unsure, default to 'keywords'\n\n"
-                
-                "If the user says 'today', set timeframe to 'day'. If 'this week' or 'week', set timeframe to 'week'. "
-                "If 'this month' or 'month', set timeframe to 'month'. If 'all', set timeframe to 'all'.\n\n"
-                f"User request: \"{query_text}\""
-            )
-            
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
+            parsing_prompt = _PARSING_PROMPT_PREFIX + f"User request: \"{query_text}\""
+
+            # Extracting a three-field JSON from a short sentence doesn't need
+            # the flagship model; mini is markedly faster and cheaper here
+            response = await self._chat_completion(
+                model="gpt-4o-mini",
                 messages=[{"role": "user", "content": parsing_prompt}],
-                response_format={"type": "json_object"}
+                response_format=_PARSING_RESPONSE_FORMAT,
+                temperature=0
             )
-            
-            parsed_query = json.loads(response.choices[0].message.content)
-            print(f"AI parsed recap query: {parsed_query}")
-            
+
+            parsed_query = orjson.loads(response.choices[0].message.content)
+            logger.info("AI parsed recap query: %s", parsed_query)
+
+            self._recap_parse_cache[cache_key] = parsed_query
             return parsed_query
-            
+
         except Exception as e:
-            print(f"OpenAI query parsing error: {e}")
+            logger.error("OpenAI query parsing error: %s", e)
             raise Exception(f"Failed to parse query: {e}")
     
-    async def generate_summary(self, query_text: str, data: Dict[str, Any]) -> str:
-        """Generate a natural language summary based on spending data."""
+    async def generate_summary(self, query_text: str, data: Dict[str, Any],
+                               on_progress=None) -> str:
+        """Generate a natural language summary based on spending data.
+
+        When on_progress (an async callable taking the accumulated text) is
+        given, the completion is streamed and the callback fires as chunks
+        arrive, so callers can show partial output at time-to-first-token
+        instead of waiting out the whole generation.
+        """
         try:
-            summary_prompt = (
-                "You are a smart financial assistant who says only necessary information. "
-                "Based on the following JSON data, write a short, simple-easy-to-read summary. "
-                "Address the user's original query directly. Mention the total amount and number of transactions if relevant.\n\n"
+            summary_prompt = _SUMMARY_PROMPT_PREFIX + (
                 f"User's Original Query: \"{query_text}\"\n"
-                f"Data: {json.dumps(data)}"
-            )
-            
-            response = await self.client.chat.completions.create(
-                model="gpt-4o", 
-                messages=[{"role": "user", "content": summary_prompt}], 
-                temperature=0.7, 
-                max_tokens=300
+                f"Data: {orjson.dumps(data, option=orjson.OPT_NAIVE_UTC).decode()}"
             )
-            
-            return response.choices[0].message.content
-            
+
+            if on_progress is None:
+                response = await self._chat_completion(
+                    model="gpt-4o-mini",
+                    messages=[{"role": "user", "content": summary_prompt}],
+                    temperature=0.3,
+                    max_tokens=160
+                )
+                return response.choices[0].message.content
+
+            messages = [{"role": "user", "content": summary_prompt}]
+            await _OPENAI_LIMITER.acquire(_estimate_tokens(messages))
+            async with _OPENAI_SEM:
+                stream = await self.client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=160,
+                    stream=True
+                )
+                parts = []
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        await on_progress("".join(parts))
+                return "".join(parts)
+
         except Exception as e:
-            print(f"OpenAI summary generation error: {e}")
+            logger.error("OpenAI summary generation error: %s", e)
             raise Exception(f"Failed to generate summary: {e}")
 
+# Entity labels that look like merchant names; set for O(1) filtering
+_ORG_LABELS = {"ORG", "GPE", "PERSON"}
+
+# OCR preprocessing primitives. The sharpening is a single 3x3 kernel
+# equivalent to ImageEnhance.Sharpness(2.0) (2*identity - smooth), built once
+# at import; the contrast LUT must anchor at each image's mean luminance to
+# match ImageEnhance.Contrast, so only its 256-entry table is built per call
+# (microseconds) while the pixel pass stays one C-level Image.point.
+_SHARPEN_KERNEL = ImageFilter.Kernel(
+    (3, 3), [-1, -1, -1, -1, 21, -1, -1, -1, -1], scale=13
+)
+
+
+def _contrast_lut(mean: int, factor: float = 2.0) -> List[int]:
+    """Point table for ImageEnhance.Contrast(factor) around the given mean.
+
+    Contrast enhancement blends toward a solid image of the mean luminance,
+    i.e. p' = mean + (p - mean) * factor, clamped to [0, 255]. Anchoring at
+    the per-image mean matters for receipts: bright paper (mean ~190) stays
+    near the mean instead of being pushed into clipping, which a fixed
+    midpoint of 128 would do.
+    """
+    return [min(255, max(0, round((i - mean) * factor + mean))) for i in range(256)]
+
 class OCRService:
     """Service for OCR and text processing operations."""
-    
+
     def __init__(self):
-        # Load spaCy model for NLP
+        # Load spaCy model for NLP. Only NER is used, so skip the tagger/
+        # parser/lemmatizer components that would otherwise dominate the
+        # per-call cost of the merchant fallback.
         try:
-            self.nlp = spacy.load("en_core_web_sm")
-            print("✅ spaCy model loaded.")
+            self.nlp = spacy.load(
+                "en_core_web_sm",
+                disable=["tagger", "parser", "lemmatizer", "attribute_ruler"]
+            )
+            logger.info("✅ spaCy model loaded.")
         except OSError:
-            print("❌ spaCy model 'en_core_web_sm' not found. Please run: python -m spacy download en_core_web_sm")
+            logger.error("❌ spaCy model 'en_core_web_sm' not found. Please run: python -m spacy download en_core_web_sm")
             self.nlp = None
+
+        # Keep one in-process Tesseract API alive instead of spawning a
+        # tesseract subprocess (plus temp-file I/O) for every receipt.
+        # PyTessBaseAPI is not thread-safe, so access is serialized.
+        self._tess = None
+        self._tess_lock = threading.Lock()
+        if tesserocr is not None:
+            try:
+                self._tess = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK)
+                logger.info("✅ tesserocr API initialized.")
+            except Exception as e:
+                logger.error("❌ Could not initialize tesserocr, falling back to pytesseract: %s", e)
     
-    def preprocess_image_for_ocr(self, image_bytes: bytes) -> Image.Image:
-        """Preprocess image for better OCR results."""
+    def preprocess_image_for_ocr(self, image_data) -> Image.Image:
+        """Preprocess image (bytes or file-like) for better OCR results."""
         try:
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_bytes))
-            
+            # Accept a file-like object directly so callers can hand over the
+            # download buffer without an intermediate bytes copy
+            if not hasattr(image_data, 'read'):
+                image_data = io.BytesIO(image_data)
+            image = Image.open(image_data)
+
+            # Tesseract's cost grows roughly quadratically with pixel count
+            # and a 12MP phone photo gains nothing over ~1600px on the long
+            # edge for receipt-sized text; thumbnail resizes in place and
+            # never upscales
+            image.thumbnail((1600, 1600), Image.LANCZOS)
+
             # Convert to grayscale
             if image.mode != 'L':
                 image = image.convert('L')
-            
-            # Enhance contrast
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(2.0)
-            
-            # Enhance sharpness
-            enhancer = ImageEnhance.Sharpness(image)
-            image = enhancer.enhance(2.0)
-            
+
+            # Enhance contrast via a LUT anchored at this image's mean (what
+            # ImageEnhance.Contrast does), then sharpen with the fused
+            # kernel — one pass each over the pixel buffer
+            mean = int(ImageStat.Stat(image).mean[0] + 0.5)
+            image = image.point(_contrast_lut(mean))
+            image = image.filter(_SHARPEN_KERNEL)
+
             return image
             
         except Exception as e:
-            print(f"Image preprocessing error: {e}")
+            logger.error("Image preprocessing error: %s", e)
             raise Exception(f"Failed to preprocess image: {e}")
     
-    def extract_text_from_image(self, image_bytes: bytes) -> str:
-        """Extract text from image using OCR."""
+    def extract_text_from_image(self, image_data) -> str:
+        """Extract text from image (bytes or file-like) using OCR."""
         try:
-            processed_image = self.preprocess_image_for_ocr(image_bytes)
-            custom_config = r'--oem 3 --psm 6'
-            ocr_text = pytesseract.image_to_string(processed_image, config=custom_config)
+            processed_image = self.preprocess_image_for_ocr(image_data)
+            if self._tess is not None:
+                with self._tess_lock:
+                    self._tess.SetImage(processed_image)
+                    ocr_text = self._tess.GetUTF8Text()
+            else:
+                custom_config = r'--oem 3 --psm 6'
+                ocr_text = pytesseract.image_to_string(processed_image, config=custom_config)
             
-            print(f"OCR Result:\n---\n{ocr_text}\n---")
+            logger.info("OCR Result:\n---\n%s\n---", ocr_text)
             
             if not ocr_text.strip():
                 raise Exception("No text found in image.")
@@ -183,7 +510,7 @@ class OCRService:
             return ocr_text.strip()
             
         except Exception as e:
-            print(f"OCR Error: {e}")
+            logger.error("OCR Error: %s", e)
             raise Exception(f"Failed to extract text from image: {e}")
     
     def extract_transaction_details(self, text: str) -> Dict[str, Any]:
@@ -201,77 +528,82 @@ class OCRService:
                 raise Exception("Could not find amount in text.")
             
             # 2. Merchant/Keyword Extraction
+            # None means no plausible merchant — clearer and cheaper than
+            # comparing against a case-folded "Unknown" sentinel string
             merchant = self._extract_merchant(text, amount_str)
-            parsed_data["keywords"] = [merchant] if merchant != "Unknown" else []
+            parsed_data["keywords"] = [merchant] if merchant else []
             
-            print(f"Extracted transaction details: {parsed_data}")
+            logger.info("Extracted transaction details: %s", parsed_data)
             return parsed_data
             
         except Exception as e:
-            print(f"Transaction details extraction error: {e}")
+            logger.error("Transaction details extraction error: %s", e)
             raise Exception(f"Failed to extract transaction details: {e}")
     
     def _extract_amount(self, text: str) -> str:
         """Extract amount from text."""
         # Try to find amount with currency symbol
-        match_full = re.search(r"(?:SGD|S\$|\$)\s*(\d+(?:\.\d{1,2})?)", text, re.IGNORECASE)
+        match_full = _AMOUNT_FULL_RE.search(text)
         if match_full:
             return match_full.group(1)
-        
+
         # Try to find any number (take the last one)
-        found_numbers = re.findall(r"(\d+(?:\.\d{1,2})?)", text)
+        found_numbers = _AMOUNT_ANY_RE.findall(text)
         if found_numbers:
             return found_numbers[-1]
         
         return None
     
-    def _extract_merchant(self, text: str, amount_str: str) -> str:
-        """Extract merchant name from text."""
+    def _extract_merchant(self, text: str, amount_str: str) -> Optional[str]:
+        """Extract merchant name from text; None when nothing plausible."""
         # Remove amount from text for merchant extraction
         text_for_merchant = text
         if amount_str:
-            text_for_merchant = re.sub(r'\b' + re.escape(amount_str) + r'\b', '', text_for_merchant, 1).strip()
+            # The amount is a known literal, so a plain replace avoids
+            # building (and compiling) a fresh regex per image
+            text_for_merchant = text_for_merchant.replace(amount_str, '', 1).strip()
         
         if not text_for_merchant:
-            return "Unknown"
+            return None
         
-        # Try to match known merchants
-        lower_text = text_for_merchant.lower()
-        for known_merchant in COMMON_MERCHANTS:
-            if known_merchant in lower_text:
-                return known_merchant.title()
+        # Try to match known merchants in one pass
+        merchant_match = _MERCHANT_RE.search(text_for_merchant)
+        if merchant_match:
+            return merchant_match.group(0).lower().title()
         
         # Try to find capitalized words (likely merchant names)
-        caps_match = re.search(r"\b([A-Z][A-Z\s]{2,})\b", text_for_merchant)
+        caps_match = _CAPS_RE.search(text_for_merchant)
         if caps_match:
             return caps_match.group(1).strip()
         
-        # Use NLP to find entities
-        if self.nlp:
+        # Use NLP to find entities (skip for text too short to hold a name)
+        if self.nlp and len(text_for_merchant) >= 3:
             doc = self.nlp(text_for_merchant)
-            entities = [ent.text.strip() for ent in doc.ents if ent.label_ in ("ORG", "GPE", "PERSON")]
+            entities = [ent.text.strip() for ent in doc.ents if ent.label_ in _ORG_LABELS]
             if entities:
                 return entities[0]
         
         # Fallback: find nouns
-        noun_matches = re.findall(r"\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b", text_for_merchant)
+        noun_matches = _NOUN_RE.findall(text_for_merchant)
         if noun_matches:
             return noun_matches[0]
         
-        return "Unknown"
+        return None
     
-    async def process_image_transaction(self, image_bytes: bytes) -> Tuple[str, float]:
+    async def process_image_transaction(self, image_data) -> Tuple[str, float]:
         """Process image and extract only the amount."""
         try:
-            # Extract text from image
-            ocr_text = self.extract_text_from_image(image_bytes)
+            # Tesseract blocks for hundreds of milliseconds per receipt;
+            # run it in a worker thread so the event loop keeps serving
+            # other updates while the OCR grinds
+            ocr_text = await asyncio.to_thread(self.extract_text_from_image, image_data)
             # Extract amount from text
             amount = self._extract_amount(ocr_text)
             if not amount:
                 raise Exception("Could not extract amount from image")
             return ocr_text, float(amount)
         except Exception as e:
-            print(f"Image transaction processing error: {e}")
+            logger.error("Image transaction processing error: %s", e)
             raise Exception(f"Failed to process image transaction: {e}")
 
 class TransactionService:
@@ -280,10 +612,20 @@ class TransactionService:
     def __init__(self, ai_service: AIService, ocr_service: OCRService):
         self.ai_service = ai_service
         self.ocr_service = ocr_service
+        # Keyword-set -> Category LRU: users log near-identical transactions
+        # ("$5.50 coffee starbucks") constantly, and a hit here skips the AI
+        # call (the dominant latency in the confirm path) entirely
+        self._keyword_category_cache: "OrderedDict[str, Category]" = OrderedDict()
     
-    async def create_transaction_from_text(self, raw_text: str, amount: float, 
-                                         keywords: List[str], source: TransactionSource = TransactionSource.TEXT, user_id: int = None) -> Transaction:
-        """Create a transaction from text input."""
+    async def create_transaction_from_text(self, raw_text: str, amount: float,
+                                         keywords: List[str], source: TransactionSource = TransactionSource.TEXT, user_id: int = None,
+                                         category_task: Optional["asyncio.Task"] = None) -> Transaction:
+        """Create a transaction from text input.
+
+        category_task optionally carries an already-running categorization
+        (started speculatively while the user was confirming), so by the time
+        this runs the AI answer is usually ready.
+        """
         try:
             # Validate input
             if amount <= 0:
@@ -291,24 +633,37 @@ class TransactionService:
             
             if not keywords:
                 raise Exception("At least one keyword is required")
-            
-            # Categorize transaction using AI
+
+            # Store keywords lowercased and deduplicated, preserving order:
+            # the text parser already lowercases, and normalizing the receipt
+            # and keyword-input paths the same way keeps stored values
+            # consistent for the case-insensitive recap filters
+            seen = set()
+            deduped = []
+            for kw in keywords:
+                lowered = kw.lower()
+                if lowered not in seen:
+                    seen.add(lowered)
+                    deduped.append(lowered)
+            keywords = deduped
+
+            # Create transaction (category is patched in once the AI answers,
+            # unless this exact keyword set was categorized recently)
             first_keyword = keywords[0]
-            category = await self.ai_service.categorize_transaction(first_keyword, amount)
-            # If uncategorized or other, and multiple keywords, retry with first keyword only
-            if (category.name.upper() in ["UNCATEGORIZED", "OTHER"]) and len(keywords) > 1:
-                category = await self.ai_service.categorize_transaction(first_keyword, amount)
-            
-            # Create transaction
+            cache_key = " ".join(sorted(k.lower() for k in keywords))
+            cached_category = self._keyword_category_cache.get(cache_key)
+            if cached_category is not None:
+                self._keyword_category_cache.move_to_end(cache_key)
+
             transaction = Transaction(
                 amount=amount,
                 currency=Currency.SGD,
                 keywords=keywords,
-                category=category,
+                category=cached_category or Category.UNCATEGORIZED,
                 raw_text=raw_text,
                 source=source
             )
-            
+
             # Save to database using existing connection schema
             doc = {
                 "rawText": transaction.raw_text,
@@ -324,14 +679,41 @@ class TransactionService:
             }
             if user_id is not None:
                 doc["userId"] = user_id
-            result = connection.transactions_collection.insert_one(doc)
-            transaction.id = str(result.inserted_id)
-            
-            print(f"Created transaction: {transaction.id}")
+
+            if cached_category is not None:
+                # Cache hit: the category is already in the document and any
+                # speculative AI call is moot
+                if category_task is not None:
+                    category_task.cancel()
+                result = await connection.transactions_collection.insert_one(doc)
+                transaction.id = str(result.inserted_id)
+            else:
+                # The insert doesn't depend on the AI result, so run both
+                # concurrently and hide the OpenAI latency behind the DB write
+                # (or collect the speculative task, which is likely done)
+                categorize = category_task if category_task is not None else \
+                    self.ai_service.categorize_transaction(first_keyword, amount)
+                category, result = await asyncio.gather(
+                    categorize,
+                    connection.transactions_collection.insert_one(doc)
+                )
+                transaction.id = str(result.inserted_id)
+                transaction.category = category
+                if category != Category.UNCATEGORIZED:
+                    await connection.transactions_collection.update_one(
+                        {"_id": result.inserted_id},
+                        {"$set": {"category": category.value}}
+                    )
+                if category not in (Category.OTHER, Category.UNCATEGORIZED):
+                    self._keyword_category_cache[cache_key] = category
+                    while len(self._keyword_category_cache) > 2048:
+                        self._keyword_category_cache.popitem(last=False)
+
+            logger.info("Created transaction: %s", transaction.id)
             return transaction
             
         except Exception as e:
-            print(f"Failed to create transaction from text: {e}")
+            logger.error("Failed to create transaction from text: %s", e)
             raise Exception(f"Failed to create transaction: {e}")
     
     async def create_transaction_from_image(self, image_bytes: bytes) -> Transaction:
@@ -349,25 +731,29 @@ class TransactionService:
             )
             
         except Exception as e:
-            print(f"Failed to create transaction from image: {e}")
+            logger.error("Failed to create transaction from image: %s", e)
             raise Exception(f"Failed to create transaction from image: {e}")
     
     async def delete_transaction(self, transaction_id: str) -> bool:
         """Delete a transaction by ID."""
         try:
+            # Reject malformed IDs before touching the database
+            if not ObjectId.is_valid(transaction_id):
+                raise Exception(f"Invalid transaction ID: {transaction_id}")
+
             # Delete transaction using existing connection
-            result = connection.transactions_collection.delete_one({"_id": ObjectId(transaction_id)})
+            result = await connection.transactions_collection.delete_one({"_id": ObjectId(transaction_id)})
             success = result.deleted_count > 0
             
             if success:
-                print(f"Deleted transaction: {transaction_id}")
+                logger.info("Deleted transaction: %s", transaction_id)
             else:
-                print(f"Failed to delete transaction: {transaction_id}")
+                logger.error("Failed to delete transaction: %s", transaction_id)
             
             return success
             
         except Exception as e:
-            print(f"Failed to delete transaction {transaction_id}: {e}")
+            logger.error("Failed to delete transaction %s: %s", transaction_id, e)
             raise Exception(f"Failed to delete transaction: {e}")
     
     async def add_keywords_to_transaction(self, transaction_id: str, new_keywords: List[str]) -> Transaction:
@@ -376,27 +762,30 @@ class TransactionService:
             # Validate input
             if not new_keywords:
                 raise Exception("At least one keyword is required")
-            
-            # Add keywords using existing connection schema
-            result = connection.transactions_collection.update_one(
+            if not ObjectId.is_valid(transaction_id):
+                raise Exception(f"Invalid transaction ID: {transaction_id}")
+
+            # Lowercase to match the stored keyword normalization, so
+            # $addToSet dedupes against existing values instead of adding
+            # case variants
+            new_keywords = [kw.lower() for kw in new_keywords]
+
+            # Add the keywords and read back the updated document in one
+            # atomic round trip (also closes the update/read race window)
+            doc = await connection.transactions_collection.find_one_and_update(
                 {"_id": ObjectId(transaction_id)},
-                {"$addToSet": {"parsedData.keywords": {"$each": new_keywords}}}
+                {"$addToSet": {"parsedData.keywords": {"$each": new_keywords}}},
+                return_document=ReturnDocument.AFTER
             )
-            
-            if result.modified_count == 0:
-                raise Exception("Failed to add keywords to transaction")
-            
-            # Get updated transaction
-            doc = connection.transactions_collection.find_one({"_id": ObjectId(transaction_id)})
             if not doc:
                 raise Exception("Transaction not found")
             
             transaction = Transaction.from_dict(doc)
-            print(f"Added keywords to transaction {transaction_id}: {new_keywords}")
+            logger.info("Added keywords to transaction %s: %s", transaction_id, new_keywords)
             return transaction
             
         except Exception as e:
-            print(f"Failed to add keywords to transaction {transaction_id}: {e}")
+            logger.error("Failed to add keywords to transaction %s: %s", transaction_id, e)
             raise Exception(f"Failed to add keywords: {e}")
     
     async def get_spending_summary(self, timeframe: TimeFrame, 
@@ -405,14 +794,14 @@ class TransactionService:
         """Get spending summary for a given timeframe and filters."""
         try:
             # Use existing connection function
-            spending_data = connection.get_spending_data(
+            spending_data = await connection.get_spending_data(
                 timeframe.value, 
                 filter_type.value if filter_type else None, 
                 filter_value
             )
             return spending_data or {"total_amount": 0, "count": 0}
         except Exception as e:
-            print(f"Failed to get spending summary: {e}")
+            logger.error("Failed to get spending summary: %s", e)
             raise Exception(f"Failed to get spending summary: {e}")
     
     async def get_transactions_by_timeframe(self, timeframe: TimeFrame,
@@ -421,7 +810,7 @@ class TransactionService:
         """Get transactions for a given timeframe and filters."""
         try:
             # Use existing connection function
-            raw_transactions = connection.get_raw_transactions(
+            raw_transactions = await connection.get_raw_transactions(
                 timeframe.value,
                 filter_type.value if filter_type else None,
                 filter_value
@@ -438,7 +827,7 @@ class TransactionService:
             
             return transactions
         except Exception as e:
-            print(f"Failed to get transactions by timeframe: {e}")
+            logger.error("Failed to get transactions by timeframe: %s", e)
             raise Exception(f"Failed to get transactions: {e}")
     
     async def get_most_used_keywords(self, user_id: int, limit: int = 5) -> list:
@@ -451,18 +840,112 @@ class TransactionService:
                 {"$sort": {"totalSpent": -1}},
                 {"$limit": limit}
             ]
-            results = list(connection.transactions_collection.aggregate(pipeline))
+            results = await connection.transactions_collection.aggregate(pipeline).to_list(length=None)
             return [r["_id"] for r in results if r["_id"]]
         except Exception as e:
-            print(f"Failed to get most used keywords for user {user_id}: {e}")
+            logger.error("Failed to get most used keywords for user %s: %s", user_id, e)
             return []
 
+# Vocabulary for the deterministic recap-query fast path
+_FAST_TIMEFRAMES = {
+    'today': 'day', 'day': 'day', 'week': 'week', 'month': 'month', 'all': 'all'
+}
+# Timeframe alias -> enum, built once; covers both parser outputs
+_TIMEFRAME_ALIASES = {
+    'today': TimeFrame.DAY,
+    'day': TimeFrame.DAY,
+    'this week': TimeFrame.WEEK,
+    'week': TimeFrame.WEEK,
+    'this month': TimeFrame.MONTH,
+    'month': TimeFrame.MONTH,
+    'all': TimeFrame.ALL
+}
+_FAST_CATEGORIES = {
+    'food', 'transport', 'shopping', 'groceries', 'entertainment',
+    'health', 'bills', 'services'
+}
+_FAST_LIST_WORDS = {'list', 'show', 'see'}
+_FAST_SUMMARY_WORDS = {'summary', 'summarise', 'summarize', 'total'}
+_FAST_FILLER_WORDS = {
+    'this', 'my', 'the', 'spending', 'expenses', 'transactions',
+    # "how much did I spend ..." phrasing
+    'how', 'much', 'did', 'i', 'what', 'me', 'spend', 'spent', 'in', 'of'
+}
+# Prepositions that mark the next token as a merchant/keyword filter
+_FAST_PREPOSITIONS = {'at', 'on', 'for'}
+
 class AnalyticsService:
     """Service for spending analytics and reporting."""
     
     def __init__(self, transaction_service: TransactionService, ai_service: AIService):
         self.transaction_service = transaction_service
         self.ai_service = ai_service
+
+    def _parse_query_fast(self, query_text: str) -> Optional[Dict[str, Any]]:
+        """Parse deterministic recap queries without an AI call.
+
+        Handles the short forms ("today", "food this week", "list month",
+        a single keyword) and the full question templates the bot itself
+        suggests ("How much did I spend on transport this week?",
+        "Show summary for grab") locally; returns None whenever any token
+        is unrecognized so the AI parser stays the fallback for the long
+        tail.
+        """
+        tokens = _SINGLE_WORD_RE.findall(query_text.lower())
+        if not tokens or len(tokens) > 12:
+            return None
+        # Cap on substantive tokens, not raw length: the bot's own suggested
+        # template "How much did I spend on transport this week?" is nine
+        # words but only three carry meaning, and filler never adds parse
+        # ambiguity (every unknown token still bails out below)
+        substantive = sum(
+            1 for t in tokens
+            if t not in _FAST_FILLER_WORDS and t not in _FAST_PREPOSITIONS
+        )
+        if substantive > 5:
+            return None
+
+        action = 'summarize'
+        saw_summary_word = False
+        timeframe = None
+        filter_type = 'none'
+        filter_value = 'none'
+        prev = None
+        for token in tokens:
+            if token in _FAST_LIST_WORDS:
+                action = 'list'
+            elif token in _FAST_SUMMARY_WORDS:
+                saw_summary_word = True
+            elif token in _FAST_TIMEFRAMES:
+                timeframe = _FAST_TIMEFRAMES[token]
+            elif token in _FAST_CATEGORIES:
+                if filter_type != 'none':
+                    return None  # two filters — let the AI disambiguate
+                filter_type = 'category'
+                filter_value = token
+            elif token in _FAST_FILLER_WORDS or token in _FAST_PREPOSITIONS:
+                pass
+            elif filter_type == 'none' and (len(tokens) <= 2 or prev in _FAST_PREPOSITIONS):
+                # An unknown word is a keyword filter when the query is just
+                # that word, or when a preposition introduces it ("at koufu")
+                filter_type = 'keywords'
+                filter_value = token
+            else:
+                return None
+            prev = token
+
+        # "show summary for X" means summarize even though 'show' is a list word
+        if saw_summary_word:
+            action = 'summarize'
+
+        parsed_query = {
+            'action': action,
+            'timeframe': timeframe or ('all' if filter_type != 'none' else 'week'),
+            'filter_type': filter_type,
+            'filter_value': filter_value
+        }
+        logger.info("Fast-parsed recap query: %s", parsed_query)
+        return parsed_query
     
     async def analyze_spending_query(self, query_text: str) -> Dict[str, Any]:
         """Analyze a natural language spending query and return results."""
@@ -477,8 +960,11 @@ class AnalyticsService:
                     'count': len(transactions)
                 }
 
-            # Parse the query using AI
-            parsed_query = await self.ai_service.parse_recap_query(query_text)
+            # Parse the query locally when it is deterministic; only the
+            # long tail pays for a GPT round-trip
+            parsed_query = self._parse_query_fast(query_text)
+            if parsed_query is None:
+                parsed_query = await self.ai_service.parse_recap_query(query_text)
             
             # Extract parameters
             action = parsed_query.get('action', 'summarize')
@@ -487,9 +973,8 @@ class AnalyticsService:
             filter_value = parsed_query.get('filter_value', 'none')
             
             # Force filter_type to 'keywords' for single-word or 'at X' queries
-            import re
-            single_word = bool(re.fullmatch(r'\w+', query_text.strip()))
-            at_x = bool(re.search(r'\bat\s+\w+', query_text.strip(), re.IGNORECASE))
+            single_word = bool(_SINGLE_WORD_RE.fullmatch(query_text.strip()))
+            at_x = bool(_AT_X_RE.search(query_text.strip()))
             
             if filter_type_str == 'keywords' or single_word or at_x:
                 # All keyword queries: search all keywords (both first and secondary)
@@ -522,11 +1007,15 @@ class AnalyticsService:
                 }
                 
         except Exception as e:
-            print(f"Failed to analyze spending query: {e}")
+            logger.error("Failed to analyze spending query: %s", e)
             raise Exception(f"Failed to analyze spending query: {e}")
     
-    async def generate_spending_report(self, query_text: str) -> str:
-        """Generate a natural language spending report."""
+    async def generate_spending_report(self, query_text: str, on_progress=None) -> str:
+        """Generate a natural language spending report.
+
+        on_progress is forwarded to the AI summary so callers can stream
+        partial text; list reports are built locally and return in one piece.
+        """
         try:
             # Analyze the query
             analysis = await self.analyze_spending_query(query_text)
@@ -543,7 +1032,9 @@ class AnalyticsService:
                 # Sort transactions by date, newest first
                 transactions.sort(key=lambda x: x.created_at, reverse=True)
 
-                report = f"📋 <b>Transactions for '{query_text}'</b>\n\n"
+                # Collect the report pieces and join once at the end — O(N)
+                # instead of rebuilding an ever-longer string per concatenation
+                parts = [f"📋 <b>Transactions for '{query_text}'</b>\n\n"]
 
                 # Using a more compact table format without category
                 table_rows = []
@@ -560,39 +1051,30 @@ class AnalyticsService:
                     if len(keywords) > 15:
                         keywords = keywords[:14] + "…"
 
-                    row = f"{date_str:<10} {amount_str:>8}  {keywords}\n"
-                    table_rows.append(row)
+                    table_rows.append(f"{date_str:<10} {amount_str:>8}  {keywords}\n")
 
-                report += f"<pre><code>{''.join(table_rows)}</code></pre>\n"
+                parts.append(f"<pre><code>{''.join(table_rows)}</code></pre>\n")
 
                 # Summary
-                report += f"📊 <b>Summary:</b>\n"
-                report += f"• Total: <b>SGD {total_amount:.2f}</b> ({count} transactions)\n"
+                parts.append("📊 <b>Summary:</b>\n")
+                parts.append(f"• Total: <b>SGD {total_amount:.2f}</b> ({count} transactions)\n")
                 if count > 0:
-                    report += f"• Average: <b>SGD {total_amount/count:.2f}</b>"
-                
-                return report
+                    parts.append(f"• Average: <b>SGD {total_amount/count:.2f}</b>")
+
+                return "".join(parts)
             else:
                 # Generate summary report using AI
                 summary_data = analysis['summary']
-                return await self.ai_service.generate_summary(query_text, summary_data)
+                return await self.ai_service.generate_summary(query_text, summary_data,
+                                                              on_progress=on_progress)
                 
         except Exception as e:
-            print(f"Failed to generate spending report: {e}")
+            logger.error("Failed to generate spending report: %s", e)
             raise Exception(f"Failed to generate spending report: {e}")
     
     def _normalize_timeframe(self, timeframe_str: str) -> TimeFrame:
         """Normalize timeframe string to TimeFrame enum."""
-        timeframe_map = {
-            'today': TimeFrame.DAY,
-            'day': TimeFrame.DAY,
-            'this week': TimeFrame.WEEK,
-            'week': TimeFrame.WEEK,
-            'this month': TimeFrame.MONTH,
-            'month': TimeFrame.MONTH,
-            'all': TimeFrame.ALL
-        }
-        return timeframe_map.get(timeframe_str.lower(), TimeFrame.WEEK)
+        return _TIMEFRAME_ALIASES.get(timeframe_str.lower(), TimeFrame.WEEK)
     
     def _normalize_filter_type(self, filter_type_str: str) -> Optional[FilterType]:
         """Normalize filter type string to FilterType enum."""
@@ -1,11 +1,19 @@
 # app_simple/telegram_handlers.py
+import asyncio
+import io
 import logging
+import re
+import time
+from collections import defaultdict
 from typing import Dict, Any, Optional, List
+
+from cachetools import TTLCache
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from telegram.constants import ParseMode
+from telegram.constants import ChatAction, ParseMode
 
 from app.config import settings
+from app.rate_limit import TelegramRateLimiter
 from app.services import AIService, OCRService, TransactionService, AnalyticsService
 from app.models import Category, TransactionSource
 
@@ -19,10 +27,131 @@ logger = logging.getLogger(__name__)
 # Conversation states
 WAITING_FOR_AMOUNT, WAITING_FOR_KEYWORDS, WAITING_FOR_CONFIRMATION = range(3)
 
+# Single amount pattern, compiled once at import. The old pattern list began
+# with a bare-number pattern that subsumed the $/SGD/dollars variants, so one
+# scan for the first number is behavior-identical and a third of the work.
+_AMOUNT_RE = re.compile(r'(\d+(?:\.\d{1,2})?)')
+
+# Common words excluded from keyword extraction (built once, O(1) lookups)
+_EXCLUDE_WORDS = frozenset({
+    'at', 'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'to', 'for', 'of', 'with',
+    'by', 'from', 'up', 'about', 'into', 'through', 'during', 'before', 'after',
+    'above', 'below', 'between', 'among', 'bought', 'purchased', 'spent', 'paid'
+})
+
+# Deletion table for punctuation in candidate keywords; one C-level
+# translate over the whole message replaces a per-word strip loop
+_PUNCT_TABLE = str.maketrans('', '', '.,!?')
+
+# Static message bodies, built once at import instead of per command
+_WELCOME_MESSAGE = (
+    "🤖 Welcome to your Personal Finance Bot!\n\n"
+    "I can help you track your expenses. Here's what I can do:\n\n"
+    "📝 <b>Record Transactions</b>\n"
+    "• Send me a message like: \"$5.50 coffee at Starbucks\"\n"
+    "• Or send me a photo of a receipt\n\n"
+    "📊 <b>View Spending</b>\n"
+    "• Ask me: \"How much did I spend this week?\"\n"
+    "• Or: \"Show me my food expenses this month\"\n\n"
+    "💡 <b>Examples</b>\n"
+    "• \"$12.80 lunch at Koufu\"\n"
+    "• \"$25.50 groceries at NTUC\"\n"
+    "• \"How much did I spend on transport this week?\"\n\n"
+    "Just send me a message to get started!"
+)
+
+_HELP_MESSAGE = (
+    "📚 <b>How to use this bot:</b>\n\n"
+    "💳 <b>Recording Transactions:</b>\n"
+    "• Text format: \"$amount description at merchant\"\n"
+    "• Photo: Send a receipt image\n\n"
+    "📊 <b>Viewing Spending:</b>\n"
+    "• \"How much did I spend today?\"\n"
+    "• \"Show my food expenses this week\"\n"
+    "• \"What did I spend on transport this month?\"\n\n"
+    "🔧 <b>Commands:</b>\n"
+    "/start - Welcome message\n"
+    "/help - This help message\n"
+    "/cancel - Cancel current operation\n\n"
+    "💡 <b>Tips:</b>\n"
+    "• Be specific with amounts and merchants\n"
+    "• Use natural language for queries\n"
+    "• Photos work best with clear text"
+)
+
+# Month abbreviations for the success-message timestamp; integer arithmetic
+# plus an f-string beats strftime's locale-aware %b/%p machinery and renders
+# the same on any server locale
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+           'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+def _format_timestamp(dt) -> str:
+    """Render a datetime as e.g. '05 Mar 02:30 PM' (strftime '%d %b %I:%M %p')."""
+    hour12 = (dt.hour - 1) % 12 + 1
+    meridiem = 'AM' if dt.hour < 12 else 'PM'
+    return f"{dt.day:02d} {_MONTHS[dt.month - 1]} {hour12:02d}:{dt.minute:02d} {meridiem}"
+
 # Helper function to chunk a list into rows of n
 def chunk_list(lst: List[str], n: int) -> List[List[str]]:
     return [lst[i:i + n] for i in range(0, len(lst), n)]
 
+# Format a currency amount via integer cents: immune to float binary
+# artifacts around the second decimal and cheaper than '%.2f'
+def format_sgd(amount: float) -> str:
+    cents = int(round(amount * 100))
+    return f"{cents // 100}.{cents % 100:02d}"
+
+# Static confirm/cancel keyboard — immutable once sent, so one shared
+# instance replaces per-message construction
+_CONFIRM_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("✅ Confirm", callback_data="confirm_transaction"),
+        InlineKeyboardButton("❌ Cancel", callback_data="cancel_transaction")
+    ]
+])
+
+# Static reply keyboards, likewise shared across all sends
+_DEFAULT_REPLY_KEYBOARD = ReplyKeyboardMarkup(
+    [["today", "this week"]], resize_keyboard=True, one_time_keyboard=False
+)
+_RECEIPT_REPLY_KEYBOARD = ReplyKeyboardMarkup(
+    [["$"]], resize_keyboard=True, one_time_keyboard=False
+)
+
+def _main_keyboard(most_used_keywords: List[str]) -> ReplyKeyboardMarkup:
+    """Shortcut rows plus the user's frequent keywords (shared static
+    instance when there are none)."""
+    if not most_used_keywords:
+        return _DEFAULT_REPLY_KEYBOARD
+    return ReplyKeyboardMarkup(
+        [["today", "this week"], *chunk_list(most_used_keywords, 2)],
+        resize_keyboard=True,
+        one_time_keyboard=False
+    )
+
+def _transaction_recorded_text(transaction) -> str:
+    """Body of the 'Transaction Recorded' message (confirm and receipt flows)."""
+    time_str = _format_timestamp(transaction.created_at)
+    return (
+        f"✅ <b>Transaction Recorded!</b>\n\n"
+        f"🗓️ <b>{time_str}</b>\n"
+        f"💰 Amount: <b>SGD {format_sgd(transaction.amount)}</b>\n"
+        f"🏷️ Keywords: {', '.join(transaction.keywords)}\n"
+        f"📂 Category: {transaction.category.value}\n\n"
+        f"What would you like to do?"
+    )
+
+def _success_keyboard(transaction_id: str) -> InlineKeyboardMarkup:
+    """Build the delete/add-keywords actions for a recorded transaction."""
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("🗑️ Delete Transaction",
+                                 callback_data=f"delete_transaction:{transaction_id}"),
+            InlineKeyboardButton("➕ Add Keywords",
+                                 callback_data=f"add_keywords:{transaction_id}")
+        ]
+    ])
+
 class TelegramHandlers:
     """Simplified Telegram bot handlers."""
     
@@ -33,89 +162,104 @@ class TelegramHandlers:
         self.transaction_service = TransactionService(self.ai_service, self.ocr_service)
         self.analytics_service = AnalyticsService(self.transaction_service, self.ai_service)
         
-        # Store temporary data during conversation
-        self.temp_data: Dict[int, Dict[str, Any]] = {}
+        # Store temporary data during conversation. TTL-bounded so abandoned
+        # conversations expire instead of accumulating for the process lifetime.
+        self.temp_data: TTLCache = TTLCache(maxsize=10000, ttl=1800)
+
+        # Outbound token buckets (Telegram: ~30 msg/s global, 1 msg/s per
+        # chat); every send below goes through _reply/_edit so bursts queue
+        # here instead of drawing 429s
+        self._limiter = TelegramRateLimiter()
+
+        # Per-user locks serialize the check-then-act sections on temp_data
+        # (e.g. a double-tapped Confirm button) without serializing users
+        # against each other. Only the pop/restore happens under the lock;
+        # AI/DB/Telegram awaits stay outside it.
+        self._user_locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+        # Last-press timestamps for inline buttons, pruned opportunistically;
+        # used to drop duplicate presses inside a one-second window
+        self._recent_callbacks: Dict[str, float] = {}
+
+        # Callback action -> handler, keyed on the part before ':'. One dict
+        # probe replaces the startswith chain; every handler takes the
+        # payload (the part after ':', possibly empty).
+        self._callback_handlers = {
+            'confirm_transaction': self._handle_confirm_transaction,
+            'cancel_transaction': self._handle_cancel_transaction,
+            'delete_transaction': self._handle_delete_transaction,
+            'add_keywords': self._handle_add_keywords,
+            'keyword_summary': self._handle_keyword_summary,
+        }
+
+        # Snapshot the allow-list once; None means no restrictions, so the
+        # per-update check is a None test or a single hash probe
+        self._allowed_user_ids: Optional[frozenset] = settings.allowed_user_ids or None
     
     def _is_authorized(self, user_id: int) -> bool:
         """Check if user is authorized."""
-        if not settings.allowed_user_ids:
-            return True  # Allow all if no restrictions
-        return user_id in settings.allowed_user_ids
+        return self._allowed_user_ids is None or user_id in self._allowed_user_ids
+
+    def _discard_temp_data(self, user_id: int) -> None:
+        """Drop pending conversation state, cancelling any speculative task."""
+        data = self.temp_data.pop(user_id, None)
+        if data:
+            task = data.get('category_task')
+            if task is not None:
+                task.cancel()
+
+    async def _reply(self, message, text: str, **kwargs):
+        """reply_text with the outbound token buckets applied."""
+        await self._limiter.acquire(message.chat_id)
+        return await message.reply_text(text, **kwargs)
+
+    async def _edit(self, message, text: str, **kwargs):
+        """edit_text with the outbound token buckets applied."""
+        await self._limiter.acquire(message.chat_id)
+        return await message.edit_text(text, **kwargs)
+
+    @staticmethod
+    async def _send_typing(message) -> None:
+        """Best-effort typing indicator; failures are irrelevant to the flow."""
+        try:
+            await message.reply_chat_action(ChatAction.TYPING)
+        except Exception:
+            pass
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /start command."""
         user_id = update.effective_user.id
         
         if not self._is_authorized(user_id):
-            await update.message.reply_text("❌ You are not authorized to use this bot.")
+            await self._reply(update.message, "❌ You are not authorized to use this bot.")
             return
         
-        welcome_message = (
-            "🤖 Welcome to your Personal Finance Bot!\n\n"
-            "I can help you track your expenses. Here's what I can do:\n\n"
-            "📝 <b>Record Transactions</b>\n"
-            "• Send me a message like: \"$5.50 coffee at Starbucks\"\n"
-            "• Or send me a photo of a receipt\n\n"
-            "📊 <b>View Spending</b>\n"
-            "• Ask me: \"How much did I spend this week?\"\n"
-            "• Or: \"Show me my food expenses this month\"\n\n"
-            "💡 <b>Examples</b>\n"
-            "• \"$12.80 lunch at Koufu\"\n"
-            "• \"$25.50 groceries at NTUC\"\n"
-            "• \"How much did I spend on transport this week?\"\n\n"
-            "Just send me a message to get started!"
-        )
         # Get most used keywords for this user (limit 5)
         most_used_keywords = await self.transaction_service.get_most_used_keywords(user_id, limit=5)
-        keyword_rows = chunk_list(most_used_keywords, 2) if most_used_keywords else []
-        custom_keyboard = ReplyKeyboardMarkup(
-            [["today", "this week"], *keyword_rows] if keyword_rows else [["today", "this week"]],
-            resize_keyboard=True,
-            one_time_keyboard=False
-        )
-        await update.message.reply_text(welcome_message, parse_mode=ParseMode.HTML, reply_markup=custom_keyboard)
+        custom_keyboard = _main_keyboard(most_used_keywords)
+        await self._reply(update.message, _WELCOME_MESSAGE, parse_mode=ParseMode.HTML, reply_markup=custom_keyboard)
     
     async def list_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /list command."""
         user_id = update.effective_user.id
         if not self._is_authorized(user_id):
-            await update.message.reply_text("❌ You are not authorized to use this bot.")
+            await self._reply(update.message, "❌ You are not authorized to use this bot.")
             return
 
         await self._handle_spending_query(update, context, "list")
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /help command."""
-        help_message = (
-            "📚 <b>How to use this bot:</b>\n\n"
-            "💳 <b>Recording Transactions:</b>\n"
-            "• Text format: \"$amount description at merchant\"\n"
-            "• Photo: Send a receipt image\n\n"
-            "📊 <b>Viewing Spending:</b>\n"
-            "• \"How much did I spend today?\"\n"
-            "• \"Show my food expenses this week\"\n"
-            "• \"What did I spend on transport this month?\"\n\n"
-            "🔧 <b>Commands:</b>\n"
-            "/start - Welcome message\n"
-            "/help - This help message\n"
-            "/cancel - Cancel current operation\n\n"
-            "💡 <b>Tips:</b>\n"
-            "• Be specific with amounts and merchants\n"
-            "• Use natural language for queries\n"
-            "• Photos work best with clear text"
-        )
-        
-        await update.message.reply_text(help_message, parse_mode=ParseMode.HTML)
+        await self._reply(update.message, _HELP_MESSAGE, parse_mode=ParseMode.HTML)
     
     async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Handle /cancel command."""
         user_id = update.effective_user.id
         
-        # Clear temporary data
-        if user_id in self.temp_data:
-            del self.temp_data[user_id]
+        # Clear temporary data (and any speculative categorization)
+        self._discard_temp_data(user_id)
         
-        await update.message.reply_text(
+        await self._reply(update.message, 
             "❌ Operation cancelled. You can start over by sending me a transaction or asking about your spending."
         )
         
@@ -123,11 +267,13 @@ class TelegramHandlers:
     
     async def handle_text_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Handle text messages - either transaction recording or spending queries."""
+        # Bind the nested PTB properties once; handlers touch them repeatedly
+        message = update.effective_message
         user_id = update.effective_user.id
-        text = update.message.text.strip()
-        
+        text = message.text.strip()
+
         if not self._is_authorized(user_id):
-            await update.message.reply_text("❌ You are not authorized to use this bot.")
+            await self._reply(message, "❌ You are not authorized to use this bot.")
             return ConversationHandler.END
 
         # Special handling for custom keyboard shortcuts
@@ -146,83 +292,74 @@ class TelegramHandlers:
         if user_id in self.temp_data and 'transaction_id' in self.temp_data[user_id]:
             return await self.handle_keywords_input(update, context)
         
-        # Check if this looks like a transaction
-        if self._looks_like_transaction(text):
-            return await self._handle_transaction_recording(update, context, text)
-        else:
+        # A transaction must contain an amount, so a C-level digit scan
+        # settles the common plain-English query ("how much did I spend...")
+        # without ever entering the regex parse
+        if not any(c.isdigit() for c in text):
             return await self._handle_spending_query(update, context, text)
+
+        # Parse once and branch on the result: a message with an amount is a
+        # transaction, anything else is a spending query. This replaces the
+        # old _looks_like_transaction pre-scan that re-ran the same regexes.
+        try:
+            amount, keywords = self._parse_transaction_text(text)
+        except ValueError:
+            return await self._handle_spending_query(update, context, text)
+        return await self._handle_transaction_recording(update, context, text, amount, keywords)
     
-    def _looks_like_transaction(self, text: str) -> bool:
-        """Check if text looks like a transaction."""
-        import re
-        # Look for any number anywhere in the message
-        amount_patterns = [
-            r'(\d+(?:\.\d{1,2})?)',  # any number
-            r'\$\d+(?:\.\d{1,2})?',  # $5.50
-            r'SGD\s*\d+(?:\.\d{1,2})?',  # SGD 5.50
-            r'\d+(?:\.\d{1,2})?\s*(?:dollars?|bucks?)',  # 5.50 dollars
-        ]
-        for pattern in amount_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return True
-        return False
-    
-    async def _handle_transaction_recording(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> int:
+    async def _handle_transaction_recording(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                            text: str, amount: float, keywords: List[str]) -> int:
         """Handle transaction recording flow."""
+        message = update.effective_message
         user_id = update.effective_user.id
-        
+
         try:
-            # Extract amount and keywords from text
-            amount, keywords = self._parse_transaction_text(text)
-            
             if not amount or amount <= 0:
-                await update.message.reply_text(
+                await self._reply(message,
                     "❌ I couldn't find a valid amount in your message. "
                     "Please use format: \"$5.50 coffee at Starbucks\""
                 )
                 return ConversationHandler.END
-            
+
             if not keywords:
-                await update.message.reply_text(
+                await self._reply(message,
                     "❌ I couldn't find any keywords/merchant in your message. "
                     "Please include what you bought and where."
                 )
                 return ConversationHandler.END
             
-            # Store temporary data
+            # Store temporary data, and start categorizing speculatively:
+            # the AI call runs while the user reads the confirmation prompt,
+            # so on Confirm the answer is usually already in hand. Cancel
+            # paths below discard the task.
             self.temp_data[user_id] = {
                 'amount': amount,
                 'keywords': keywords,
-                'raw_text': text
+                'raw_text': text,
+                'category_task': asyncio.create_task(
+                    self.ai_service.categorize_transaction(keywords[0], amount)
+                )
             }
             
             # Show confirmation
             confirmation_text = (
                 f"📝 <b>Transaction Details:</b>\n\n"
-                f"💰 Amount: <b>SGD {amount:.2f}</b>\n"
+                f"💰 Amount: <b>SGD {format_sgd(amount)}</b>\n"
                 f"🏷️ Keywords: {', '.join(keywords)}\n\n"
                 f"Is this correct? I'll categorize it automatically."
             )
             
-            keyboard = [
-                [
-                    InlineKeyboardButton("✅ Confirm", callback_data="confirm_transaction"),
-                    InlineKeyboardButton("❌ Cancel", callback_data="cancel_transaction")
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                confirmation_text, 
+            await self._reply(message,
+                confirmation_text,
                 parse_mode=ParseMode.HTML,
-                reply_markup=reply_markup
+                reply_markup=_CONFIRM_KEYBOARD
             )
-            
+
             return WAITING_FOR_CONFIRMATION
-            
+
         except Exception as e:
-            logger.error(f"Error handling transaction recording: {e}")
-            await update.message.reply_text(
+            logger.error("Error handling transaction recording: %s", e, exc_info=True)
+            await self._reply(message,
                 "❌ Sorry, I couldn't process your transaction. "
                 "Please try again with format: \"$5.50 coffee at Starbucks\""
             )
@@ -230,92 +367,114 @@ class TelegramHandlers:
     
     def _parse_transaction_text(self, text: str) -> tuple[float, list[str]]:
         """Parse transaction text to extract amount and keywords."""
-        import re
-        
         # Extract amount (first number anywhere in the message)
-        amount = None
-        
-        # Try different amount patterns (most flexible: any number, $number, SGD number, number dollars)
-        amount_patterns = [
-            r'(\d+(?:\.\d{1,2})?)',  # any number
-            r'\$(\d+(?:\.\d{1,2})?)',  # $5.50
-            r'SGD\s*(\d+(?:\.\d{1,2})?)',  # SGD 5.50
-            r'(\d+(?:\.\d{1,2})?)\s*(?:dollars?|bucks?)',  # 5.50 dollars
-        ]
-        
-        for pattern in amount_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                amount = float(match.group(1))
-                break
-        
-        if not amount:
+        match = _AMOUNT_RE.search(text)
+        if not match:
             raise ValueError("No amount found")
+        # Round-trip through integer cents so the stored amount is an exact
+        # two-decimal value rather than the nearest float to the input
+        amount = int(round(float(match.group(1)) * 100)) / 100.0
         
-        # Remove the first occurrence of the amount from text for keywords
-        text_without_amount = re.sub(r'(\d+(?:\.\d{1,2})?)', '', text, count=1, flags=re.IGNORECASE)
-        text_without_amount = re.sub(r'\$\d+(?:\.\d{1,2})?', '', text_without_amount, flags=re.IGNORECASE)
-        text_without_amount = re.sub(r'SGD\s*\d+(?:\.\d{1,2})?', '', text_without_amount, flags=re.IGNORECASE)
-        
-        # Split into words and filter
-        words = text_without_amount.split()
-        keywords = []
-        
-        # Common words to exclude
-        exclude_words = {
-            'at', 'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'to', 'for', 'of', 'with',
-            'by', 'from', 'up', 'about', 'into', 'through', 'during', 'before', 'after',
-            'above', 'below', 'between', 'among', 'bought', 'purchased', 'spent', 'paid'
-        }
-        
-        for word in words:
-            word = word.strip('.,!?').lower()
-            if word and word not in exclude_words and len(word) > 1:
-                keywords.append(word)
-        
+        # Remove the matched amount by its span — the search above already
+        # located it, so slicing beats re-scanning the string with re.sub
+        text_without_amount = text[:match.start()] + text[match.end():]
+
+        # Drop punctuation and lowercase in one pass, then filter words
+        keywords = [
+            word for word in text_without_amount.translate(_PUNCT_TABLE).lower().split()
+            if len(word) > 1 and word not in _EXCLUDE_WORDS
+        ]
+
         return amount, keywords
     
     async def _handle_spending_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> int:
         """Handle spending query."""
+        message = update.effective_message
+        status_msg = None
+        # Fire-and-forget typing indicator: the user sees activity after one
+        # outbound hop, without the handler waiting on the round-trip
+        asyncio.create_task(self._send_typing(message))
+        # The placeholder reply overlaps with the query analysis; it is only
+        # awaited once there is something to edit into it
+        status_task = asyncio.create_task(
+            self._reply(message, "🔍 Analyzing your spending query...")
+        )
         try:
-            await update.message.reply_text("🔍 Analyzing your spending query...")
-            
-            # Generate report
-            report = await self.analytics_service.generate_spending_report(text)
-            
-            await update.message.reply_text(report, parse_mode=ParseMode.HTML)
+            # Stream partial summary text into the placeholder (at most one
+            # edit per second, matching the per-chat send budget) so the user
+            # reads along from the first token instead of staring at the
+            # status line for the whole generation
+            last_edit = 0.0
+
+            async def on_progress(partial: str) -> None:
+                nonlocal last_edit, status_msg
+                now = time.monotonic()
+                if now - last_edit < 1.0:
+                    return
+                last_edit = now
+                try:
+                    if status_msg is None:
+                        status_msg = await status_task
+                    await self._edit(status_msg, partial + " ▌")
+                except Exception:
+                    pass  # partial renders are best-effort
+
+            report = await self.analytics_service.generate_spending_report(
+                text, on_progress=on_progress
+            )
+
+            if status_msg is None:
+                status_msg = await status_task
+            await self._edit(status_msg, report, parse_mode=ParseMode.HTML)
             
         except Exception as e:
-            logger.error(f"Error handling spending query: {e}")
-            await update.message.reply_text(
+            logger.error("Error handling spending query: %s", e, exc_info=True)
+            error_text = (
                 "❌ Sorry, I couldn't process your spending query. "
                 "Try asking something like \"How much did I spend this week?\""
             )
+            if status_msg is None:
+                try:
+                    status_msg = await status_task
+                except Exception:
+                    status_msg = None
+            if status_msg is not None:
+                await self._edit(status_msg, error_text)
+            else:
+                await self._reply(message, error_text)
         
         return ConversationHandler.END
     
     async def handle_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Handle photo messages (receipts)."""
+        message = update.effective_message
         user_id = update.effective_user.id
-        
+
         if not self._is_authorized(user_id):
-            await update.message.reply_text("❌ You are not authorized to use this bot.")
+            await self._reply(message, "❌ You are not authorized to use this bot.")
             return ConversationHandler.END
-        
+
         try:
-            await update.message.reply_text("📸 Processing your receipt...")
-            
-            # Get the largest photo
-            photo = update.message.photo[-1]
-            
-            # Download photo
-            file = await context.bot.get_file(photo.file_id)
-            image_bytes = await file.download_as_bytearray()
+            # The status reply and the Telegram file fetch are independent,
+            # so overlap them instead of paying two sequential round-trips
+            status_task = asyncio.create_task(
+                self._reply(message, "📸 Processing your receipt...")
+            )
+            try:
+                # Get and download the largest photo straight into a BytesIO;
+                # download_as_bytearray would allocate a second full-size copy
+                # when the OCR service re-wraps it for PIL
+                file = await context.bot.get_file(message.photo[-1].file_id)
+                image_buffer = io.BytesIO()
+                await file.download_to_memory(out=image_buffer)
+                image_buffer.seek(0)
+            finally:
+                await status_task
             
             # Process image to extract only amount
-            ocr_text, amount = await self.ocr_service.process_image_transaction(image_bytes)
+            ocr_text, amount = await self.ocr_service.process_image_transaction(image_buffer)
             if not amount:
-                await update.message.reply_text("❌ Could not extract amount from the receipt. Please try again.")
+                await self._reply(message, "❌ Could not extract amount from the receipt. Please try again.")
                 return ConversationHandler.END
             
             # Store amount and raw text, wait for keywords
@@ -325,19 +484,17 @@ class TelegramHandlers:
                 'keywords': []
             }
             
-            # Show custom keyboard with '$' button for keyword input
-            custom_keyboard = ReplyKeyboardMarkup([
-                ["$"]
-            ], resize_keyboard=True, one_time_keyboard=False)
-            await update.message.reply_text(
-                f"💰 Detected amount: <b>SGD {amount:.2f}</b>\n\nPlease enter keywords for this transaction (e.g. merchant, place, tags):\nExample: Starbucks, Jem, coffee",
+            # Show the static '$' keyboard for keyword input
+            custom_keyboard = _RECEIPT_REPLY_KEYBOARD
+            await self._reply(message,
+                f"💰 Detected amount: <b>SGD {format_sgd(amount)}</b>\n\nPlease enter keywords for this transaction (e.g. merchant, place, tags):\nExample: Starbucks, Jem, coffee",
                 parse_mode=ParseMode.HTML,
                 reply_markup=custom_keyboard
             )
             return WAITING_FOR_KEYWORDS
         except Exception as e:
-            logger.error(f"Error handling photo: {e}")
-            await update.message.reply_text(
+            logger.error("Error handling photo: %s", e, exc_info=True)
+            await self._reply(message,
                 "❌ Sorry, I couldn't process your receipt. "
                 "Please make sure the text is clear and try again."
             )
@@ -348,139 +505,127 @@ class TelegramHandlers:
         """Handle callback queries from inline buttons."""
         query = update.callback_query
         await query.answer()
-        
+
         user_id = query.from_user.id
-        
+
         if not self._is_authorized(user_id):
-            await query.edit_message_text("❌ You are not authorized to use this bot.")
+            await self._edit(query.message, "❌ You are not authorized to use this bot.")
             return ConversationHandler.END
-        
-        callback_data = query.data
-        
+
+        # Drop double-taps: the same button from the same chat within a
+        # second would only produce a redundant (and often rejected) edit.
+        # The answer() above already cleared the client-side spinner.
+        now = time.monotonic()
+        debounce_key = f"{query.message.chat_id}:{query.data}"
+        last_press = self._recent_callbacks.get(debounce_key, 0.0)
+        self._recent_callbacks[debounce_key] = now
+        if now - last_press < 1.0:
+            return ConversationHandler.END
+        if len(self._recent_callbacks) > 256:
+            cutoff = now - 5.0
+            self._recent_callbacks = {
+                key: ts for key, ts in self._recent_callbacks.items() if ts > cutoff
+            }
+
+        action, _, payload = query.data.partition(":")
+        handler = self._callback_handlers.get(action)
+
         try:
-            if callback_data == "confirm_transaction":
-                return await self._handle_confirm_transaction(update, context)
-            elif callback_data == "cancel_transaction":
-                return await self._handle_cancel_transaction(update, context)
-            elif callback_data.startswith("delete_transaction:"):
-                return await self._handle_delete_transaction(update, context, callback_data)
-            elif callback_data.startswith("add_keywords:"):
-                return await self._handle_add_keywords(update, context, callback_data)
-            elif callback_data.startswith("keyword_summary:"):
-                # Show summary for the selected keyword
-                keyword = callback_data.split(":", 1)[1]
-                # Use AnalyticsService to get summary for this keyword (formatted)
-                report = await self.analytics_service.generate_spending_report(f"Show summary for {keyword}")
-                await query.message.reply_text(report, parse_mode=ParseMode.HTML)
+            if handler is None:
+                await self._edit(query.message, "❌ Unknown action.")
                 return ConversationHandler.END
-            else:
-                await query.edit_message_text("❌ Unknown action.")
-                return ConversationHandler.END
-                
+            return await handler(update, context, payload)
+
         except Exception as e:
-            logger.error(f"Error handling callback query: {e}")
-            await query.edit_message_text("❌ An error occurred. Please try again.")
+            logger.error("Error handling callback query: %s", e, exc_info=True)
+            await self._edit(query.message, "❌ An error occurred. Please try again.")
             return ConversationHandler.END
     
-    async def _handle_confirm_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    async def _handle_confirm_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str = "") -> int:
         """Handle transaction confirmation."""
         query = update.callback_query
         user_id = query.from_user.id
-        
-        if user_id not in self.temp_data:
+
+        # Claim the pending data atomically so a double-tapped Confirm
+        # records the transaction once, not twice
+        async with self._user_locks[user_id]:
+            data = self.temp_data.pop(user_id, None)
+        if data is None:
             await query.answer("❌ No transaction data found. Please start over.")
             return ConversationHandler.END
-        
+
         try:
-            data = self.temp_data[user_id]
-            
-            # Create transaction
-            transaction = await self.transaction_service.create_transaction_from_text(
-                raw_text=data['raw_text'],
-                amount=data['amount'],
-                keywords=data['keywords'],
-                user_id=user_id
+            # The keyboard's top-keywords aggregate doesn't depend on this
+            # insert, so run it alongside the transaction creation
+            transaction, most_used_keywords = await asyncio.gather(
+                self.transaction_service.create_transaction_from_text(
+                    raw_text=data['raw_text'],
+                    amount=data['amount'],
+                    keywords=data['keywords'],
+                    user_id=user_id,
+                    category_task=data.get('category_task')
+                ),
+                self.transaction_service.get_most_used_keywords(user_id, limit=5)
             )
-            
+
             # Show success message with action buttons
-            time_str = transaction.created_at.strftime('%d %b %I:%M %p')
-            success_text = (
-                f"✅ <b>Transaction Recorded!</b>\n\n"
-                f"🗓️ <b>{time_str}</b>\n"
-                f"💰 Amount: <b>SGD {transaction.amount:.2f}</b>\n"
-                f"🏷️ Keywords: {', '.join(transaction.keywords)}\n"
-                f"📂 Category: {transaction.category.value}\n\n"
-                f"What would you like to do?"
-            )
-            
-            # Get most used unique first keywords for this user (by total spent, limit 5)
-            most_used_keywords = await self.transaction_service.get_most_used_keywords(user_id, limit=5)
-            keyword_rows = chunk_list(most_used_keywords, 2) if most_used_keywords else []
-            custom_keyboard = ReplyKeyboardMarkup(
-                [["today", "this week"], *keyword_rows] if keyword_rows else [["today", "this week"]],
-                resize_keyboard=True,
-                one_time_keyboard=False
-            )
-            await query.message.reply_text(
+            success_text = _transaction_recorded_text(transaction)
+            custom_keyboard = _main_keyboard(most_used_keywords)
+            await self._reply(query.message, 
                 success_text,
                 parse_mode=ParseMode.HTML,
                 reply_markup=custom_keyboard
             )
-            
-            # Clear temporary data
-            del self.temp_data[user_id]
-            
+
         except Exception as e:
-            logger.error(f"Error confirming transaction: {e}")
+            logger.error("Error confirming transaction: %s", e, exc_info=True)
+            # Restore the claimed data so the user can tap Confirm again
+            async with self._user_locks[user_id]:
+                self.temp_data.setdefault(user_id, data)
             await query.answer("❌ Failed to record transaction. Please try again.")
         
         return ConversationHandler.END
     
-    async def _handle_cancel_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    async def _handle_cancel_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str = "") -> int:
         """Handle transaction cancellation."""
         query = update.callback_query
         user_id = query.from_user.id
         
-        # Clear temporary data
-        if user_id in self.temp_data:
-            del self.temp_data[user_id]
+        # Clear temporary data (and any speculative categorization)
+        self._discard_temp_data(user_id)
         
-        await query.message.reply_text("❌ Transaction cancelled. Send me another transaction when ready!")
+        await self._reply(query.message, "❌ Transaction cancelled. Send me another transaction when ready!")
         return ConversationHandler.END
     
-    async def _handle_delete_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str) -> int:
+    async def _handle_delete_transaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE, transaction_id: str) -> int:
         """Handle transaction deletion."""
         query = update.callback_query
         
         try:
-            transaction_id = callback_data.split(":")[1]
-            
             # Delete transaction
             success = await self.transaction_service.delete_transaction(transaction_id)
             
             if success:
-                await query.message.reply_text("🗑️ Transaction deleted successfully!")
+                await self._reply(query.message, "🗑️ Transaction deleted successfully!")
             else:
-                await query.message.reply_text("❌ Failed to delete transaction.")
+                await self._reply(query.message, "❌ Failed to delete transaction.")
             
         except Exception as e:
-            logger.error(f"Error deleting transaction: {e}")
-            await query.message.reply_text("❌ Failed to delete transaction.")
+            logger.error("Error deleting transaction: %s", e, exc_info=True)
+            await self._reply(query.message, "❌ Failed to delete transaction.")
         
         return ConversationHandler.END
     
-    async def _handle_add_keywords(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str) -> int:
+    async def _handle_add_keywords(self, update: Update, context: ContextTypes.DEFAULT_TYPE, transaction_id: str) -> int:
         """Handle adding keywords to transaction."""
         query = update.callback_query
         
         try:
-            transaction_id = callback_data.split(":")[1]
-            
             # Store transaction ID for keyword addition
             user_id = query.from_user.id
             self.temp_data[user_id] = {'transaction_id': transaction_id}
             
-            await query.message.reply_text(
+            await self._reply(query.message, 
                 "➕ Please send me the keywords you'd like to add to this transaction.\n\n"
                 "Example: \"coffee, breakfast, morning\""
             )
@@ -488,26 +633,39 @@ class TelegramHandlers:
             return WAITING_FOR_KEYWORDS
             
         except Exception as e:
-            logger.error(f"Error handling add keywords: {e}")
-            await query.message.reply_text("❌ Failed to process request.")
+            logger.error("Error handling add keywords: %s", e, exc_info=True)
+            await self._reply(query.message, "❌ Failed to process request.")
             return ConversationHandler.END
     
+    async def _handle_keyword_summary(self, update: Update, context: ContextTypes.DEFAULT_TYPE, keyword: str) -> int:
+        """Show the formatted spending summary for the selected keyword."""
+        query = update.callback_query
+        report = await self.analytics_service.generate_spending_report(f"Show summary for {keyword}")
+        await self._reply(query.message, report, parse_mode=ParseMode.HTML)
+        return ConversationHandler.END
+
     async def handle_keywords_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Handle keywords input for adding to transaction or after receipt."""
+        message = update.effective_message
         user_id = update.effective_user.id
-        text = update.message.text.strip()
-        
-        if user_id not in self.temp_data:
-            await update.message.reply_text("❌ No transaction found. Please start over.")
+        text = message.text.strip()
+
+        # Claim the pending data atomically (same double-submit guard as the
+        # Confirm button); it is restored below on retryable failures
+        async with self._user_locks[user_id]:
+            data = self.temp_data.pop(user_id, None)
+        if data is None:
+            await self._reply(message, "❌ No transaction found. Please start over.")
             return ConversationHandler.END
-        
+
         try:
             # If this is after a receipt, use stored amount and raw_text
-            data = self.temp_data[user_id]
             if 'amount' in data and 'raw_text' in data:
                 keywords = [kw.strip() for kw in text.split(',') if kw.strip()]
                 if not keywords:
-                    await update.message.reply_text("❌ Please provide at least one keyword.")
+                    async with self._user_locks[user_id]:
+                        self.temp_data.setdefault(user_id, data)
+                    await self._reply(message, "❌ Please provide at least one keyword.")
                     return WAITING_FOR_KEYWORDS
                 # Create transaction
                 transaction = await self.transaction_service.create_transaction_from_text(
@@ -518,47 +676,33 @@ class TelegramHandlers:
                     user_id=user_id
                 )
                 # Show success message with action buttons
-                time_str = transaction.created_at.strftime('%d %b %I:%M %p')
-                success_text = (
-                    f"✅ <b>Transaction Recorded!</b>\n\n"
-                    f"🗓️ <b>{time_str}</b>\n"
-                    f"💰 Amount: <b>SGD {transaction.amount:.2f}</b>\n"
-                    f"🏷️ Keywords: {', '.join(transaction.keywords)}\n"
-                    f"📂 Category: {transaction.category.value}\n\n"
-                    f"What would you like to do?"
-                )
-                keyboard = [
-                    [
-                        InlineKeyboardButton("🗑️ Delete Transaction", 
-                                           callback_data=f"delete_transaction:{transaction.id}"),
-                        InlineKeyboardButton("➕ Add Keywords", 
-                                           callback_data=f"add_keywords:{transaction.id}")
-                    ]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(success_text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
-                del self.temp_data[user_id]
+                success_text = _transaction_recorded_text(transaction)
+                await self._reply(message, success_text, parse_mode=ParseMode.HTML,
+                                                reply_markup=_success_keyboard(transaction.id))
                 return ConversationHandler.END
             # Otherwise, this is the add keywords flow for an existing transaction
             transaction_id = data.get('transaction_id')
             if transaction_id:
                 keywords = [kw.strip() for kw in text.split(',') if kw.strip()]
                 if not keywords:
-                    await update.message.reply_text("❌ Please provide at least one keyword.")
+                    async with self._user_locks[user_id]:
+                        self.temp_data.setdefault(user_id, data)
+                    await self._reply(message, "❌ Please provide at least one keyword.")
                     return WAITING_FOR_KEYWORDS
                 transaction = await self.transaction_service.add_keywords_to_transaction(transaction_id, keywords)
                 success_text = (
                     f"✅ <b>Keywords Added!</b>\n\n"
-                    f"💰 Amount: <b>SGD {transaction.amount:.2f}</b>\n"
+                    f"💰 Amount: <b>SGD {format_sgd(transaction.amount)}</b>\n"
                     f"🏷️ Keywords: {', '.join(transaction.keywords)}\n"
                     f"📂 Category: {transaction.category.value}\n\n"
                     f"Transaction updated successfully!"
                 )
-                await update.message.reply_text(success_text, parse_mode=ParseMode.HTML)
-                del self.temp_data[user_id]
+                await self._reply(message, success_text, parse_mode=ParseMode.HTML)
                 return ConversationHandler.END
         except Exception as e:
-            logger.error(f"Error adding keywords: {e}")
-            await update.message.reply_text("❌ Failed to add keywords. Please try again.")
+            logger.error("Error adding keywords: %s", e, exc_info=True)
+            async with self._user_locks[user_id]:
+                self.temp_data.setdefault(user_id, data)
+            await self._reply(message, "❌ Failed to add keywords. Please try again.")
         
         return ConversationHandler.END 
\ No newline at end of file
@@ -1,10 +1,13 @@
 # ------------------ database/connection.py ------------------
+import logging
 import os
 from datetime import datetime, timedelta
-import pymongo
 import certifi
 from dotenv import load_dotenv
 from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,27 +17,50 @@ MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
 
 # --- Establish Connection ---
+# Motor connects lazily, so construction never blocks; connection errors
+# surface on the first awaited operation instead of at import time.
+# Explicit pool bounds: enough sockets for concurrent handlers without
+# re-handshaking TLS per burst, and a couple kept warm between bursts.
 try:
     ca = certifi.where()
-    client = pymongo.MongoClient(MONGO_URI, tlsCAFile=ca)
+    client = AsyncIOMotorClient(MONGO_URI, tlsCAFile=ca, maxPoolSize=20, minPoolSize=2)
     db = client[MONGO_DB_NAME]
     transactions_collection = db["transactions"]
-    client.admin.command('ping')
-    print("✅ MongoDB connection successful.")
+    merchant_category_cache = db["merchant_category_cache"]
+    logger.info("✅ MongoDB client initialized.")
 except Exception as e:
-    print(f"❌ Could not connect to MongoDB: {e}")
+    logger.error("❌ Could not initialize MongoDB client: %s", e)
     client = None
     transactions_collection = None
+    merchant_category_cache = None
+
+async def ensure_indexes():
+    """Creates the indexes backing recap queries. Safe to call repeatedly."""
+    if transactions_collection is None:
+        logger.error("❌ Cannot create indexes, database not connected.")
+        return
+    try:
+        # Timeframe + category filters, and the multikey keyword filter
+        await transactions_collection.create_index([("createdAt", -1), ("category", 1)])
+        await transactions_collection.create_index([("createdAt", -1), ("parsedData.keywords", 1)])
+        # Per-user aggregations (most-used keywords) match on userId first
+        await transactions_collection.create_index([("userId", 1), ("createdAt", -1)])
+        logger.info("✅ MongoDB indexes ensured.")
+    except Exception as e:
+        logger.error("❌ Error creating indexes: %s", e)
 
-def save_transaction(raw_text: str, parsed_data: dict, image_url: str = None, source: str = "text"):
+async def save_transaction(raw_text: str, parsed_data: dict, image_url: str = None, source: str = "text"):
     """Saves a new transaction document with the new keywords schema."""
     if transactions_collection is None:
-        print("❌ Cannot save transaction, database not connected.")
+        logger.error("❌ Cannot save transaction, database not connected.")
         return None
 
     keywords = parsed_data.get('keywords', [])
     if not isinstance(keywords, list):
         keywords = [keywords]
+    # Keywords are stored lowercased so case-insensitive filters compare
+    # against a consistent form
+    keywords = [k.lower() for k in keywords]
 
     document = {
         "rawText": raw_text,
@@ -50,11 +76,11 @@ def save_transaction(raw_text: str, parsed_data: dict, image_url: str = None, so
     }
 
     try:
-        result = transactions_collection.insert_one(document)
-        print(f"✅ Transaction saved with ID: {result.inserted_id}")
+        result = await transactions_collection.insert_one(document)
+        logger.info("✅ Transaction saved with ID: %s", result.inserted_id)
         return result.inserted_id
     except Exception as e:
-        print(f"❌ Error saving transaction: {e}")
+        logger.error("❌ Error saving transaction: %s", e)
         return None
 
 def _get_base_match_conditions(timeframe: str):
@@ -68,7 +94,7 @@ def _get_base_match_conditions(timeframe: str):
         start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
     elif timeframe == 'month':
         start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
+
     match_conditions = {}
     if start_date:
         match_conditions["createdAt"] = {"$gte": start_date}
@@ -77,7 +103,7 @@ def _get_base_match_conditions(timeframe: str):
 def _get_match_pipeline(timeframe: str, filter_type: str, filter_value: str):
     """Helper function to build the MongoDB $match pipeline."""
     match_conditions = _get_base_match_conditions(timeframe)
-        
+
     if filter_type and filter_value and filter_value != 'none':
         # Create a case-insensitive regex for flexible matching
         regex_filter = {"$regex": f"{filter_value}", "$options": "i"}
@@ -88,7 +114,7 @@ def _get_match_pipeline(timeframe: str, filter_type: str, filter_value: str):
             {"parsedData.keywords": regex_filter}
         ]
     # If filter_type/filter_value is none or 'none', do not add $or filter at all
-    
+
     return [{"$match": match_conditions}] if match_conditions else []
 
 def _get_match_pipeline_all_keywords(timeframe: str, filter_value: str):
@@ -99,7 +125,7 @@ def _get_match_pipeline_all_keywords(timeframe: str, filter_value: str):
     match_conditions["parsedData.keywords"] = regex_filter
     return [{"$match": match_conditions}]
 
-def get_spending_data(timeframe: str = 'week', filter_type: str = None, filter_value: str = None):
+async def get_spending_data(timeframe: str = 'week', filter_type: str = None, filter_value: str = None):
     """Fetches transactions based on dynamic filters and aggregates them for summaries."""
     if transactions_collection is None: return None
     if filter_type == 'keywords' and filter_value and filter_value != 'none':
@@ -112,13 +138,12 @@ def get_spending_data(timeframe: str = 'week', filter_type: str = None, filter_v
         ])
     else:
         pipeline = _get_match_pipeline(timeframe, filter_type, filter_value)
-        pipeline_for_list = list(pipeline)  # Copy for debugging
         pipeline.extend([
             {"$group": {"_id": None, "totalAmount": {"$sum": "$parsedData.amount"}, "count": {"$sum": 1}}}
         ])
     try:
-        results = list(transactions_collection.aggregate(pipeline))
-        print(f"🔍 Found {len(results)} aggregated results for query: {pipeline}")
+        results = await transactions_collection.aggregate(pipeline).to_list(length=None)
+        logger.info("🔍 Found %s aggregated results for query: %s", len(results), pipeline)
         if results and isinstance(results, list):
             return {
                 "total_amount": results[0].get("totalAmount", 0),
@@ -126,58 +151,63 @@ def get_spending_data(timeframe: str = 'week', filter_type: str = None, filter_v
             }
         return {"total_amount": 0, "count": 0}
     except Exception as e:
-        print(f"❌ Error fetching spending summary: {e}")
+        logger.error("❌ Error fetching spending summary: %s", e)
         return {"total_amount": 0, "count": 0}
 
-def get_raw_transactions(timeframe: str = 'week', filter_type: str = None, filter_value: str = None):
+async def get_raw_transactions(timeframe: str = 'week', filter_type: str = None, filter_value: str = None):
     """Fetches a raw list of transactions based on dynamic filters."""
     if transactions_collection is None: return None
     if filter_type == 'keywords' and filter_value and filter_value != 'none':
         pipeline = _get_match_pipeline_all_keywords(timeframe, filter_value)
     else:
         pipeline = _get_match_pipeline(timeframe, filter_type, filter_value)
+    # List rendering only needs the parsed fields and the date. An include
+    # projection keeps the documents to a few dozen bytes each — notably it
+    # drops rawText (receipt OCR dumps) and imageUrl; the omitted fields
+    # fall back to Transaction.from_dict's defaults.
+    pipeline.append({"$project": {"parsedData": 1, "category": 1, "createdAt": 1}})
     pipeline.append({"$sort": {"createdAt": -1}}) # Sort by most recent
     try:
-        results = list(transactions_collection.aggregate(pipeline))
-        print(f"🔍 Found {len(results)} raw transactions for query: {pipeline}")
+        results = await transactions_collection.aggregate(pipeline).to_list(length=None)
+        logger.info("🔍 Found %s raw transactions for query: %s", len(results), pipeline)
         return results
     except Exception as e:
-        print(f"❌ Error fetching raw transactions: {e}")
+        logger.error("❌ Error fetching raw transactions: %s", e)
         return None
 
-def delete_transaction_by_id(transaction_id: str) -> bool:
+async def delete_transaction_by_id(transaction_id: str) -> bool:
     """Deletes a transaction by its MongoDB _id. Returns True if deleted, False otherwise."""
     if transactions_collection is None:
-        print("❌ Cannot delete transaction, database not connected.")
+        logger.error("❌ Cannot delete transaction, database not connected.")
         return False
     try:
-        result = transactions_collection.delete_one({"_id": ObjectId(transaction_id)})
+        result = await transactions_collection.delete_one({"_id": ObjectId(transaction_id)})
         if result.deleted_count == 1:
-            print(f"🗑️ Transaction {transaction_id} deleted.")
+            logger.info("🗑️ Transaction %s deleted.", transaction_id)
             return True
         else:
-            print(f"❌ Transaction {transaction_id} not found.")
+            logger.error("❌ Transaction %s not found.", transaction_id)
             return False
     except Exception as e:
-        print(f"❌ Error deleting transaction: {e}")
+        logger.error("❌ Error deleting transaction: %s", e)
         return False
 
-def update_transaction_keywords_by_id(transaction_id: str, new_keywords: list) -> bool:
+async def update_transaction_keywords_by_id(transaction_id: str, new_keywords: list) -> bool:
     """Appends new keywords to the keywords array for a transaction by its _id. Returns True if updated, False otherwise."""
     if transactions_collection is None:
-        print("❌ Cannot update transaction, database not connected.")
+        logger.error("❌ Cannot update transaction, database not connected.")
         return False
     try:
-        result = transactions_collection.update_one(
+        result = await transactions_collection.update_one(
             {"_id": ObjectId(transaction_id)},
             {"$addToSet": {"parsedData.keywords": {"$each": new_keywords}}}
         )
         if result.modified_count == 1:
-            print(f"✅ Added keywords to transaction {transaction_id}: {new_keywords}")
+            logger.info("✅ Added keywords to transaction %s: %s", transaction_id, new_keywords)
             return True
         else:
-            print(f"❌ Transaction {transaction_id} not found or no new keywords added.")
+            logger.error("❌ Transaction %s not found or no new keywords added.", transaction_id)
             return False
     except Exception as e:
-        print(f"❌ Error updating transaction: {e}")
+        logger.error("❌ Error updating transaction: %s", e)
         return False
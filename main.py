@@ -6,7 +6,9 @@ A Telegram bot for tracking personal expenses with AI-powered categorization.
 
 import asyncio
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 # Add the current directory to Python path
@@ -16,18 +18,37 @@ from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQu
 from telegram import BotCommand
 
 from app.config import settings
+from app.services import close_openai_client
 from app.telegram_handlers import TelegramHandlers
+from database import connection
 
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO if not settings.debug else logging.DEBUG
-)
+# Configure logging through a queue: handlers log from the event loop, so
+# the blocking stdout write happens on the listener thread instead
+def _setup_logging() -> QueueListener:
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    )
+    log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(logging.INFO if not settings.debug else logging.DEBUG)
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+_log_listener = _setup_logging()
 logger = logging.getLogger(__name__)
 
 # Conversation states
 WAITING_FOR_AMOUNT, WAITING_FOR_KEYWORDS, WAITING_FOR_CONFIRMATION = range(3)
 
+# Command menu, built once at import
+_BOT_COMMANDS = [
+    BotCommand("start", "Start the bot"),
+    BotCommand("cancel", "Cancel current operation"),
+]
+
 async def main():
     """Main function to run the bot."""
     try:
@@ -46,18 +67,27 @@ async def main():
         
         logger.info("✅ Configuration validated successfully!")
         
+        # Make sure the recap-query indexes exist before traffic arrives
+        await connection.ensure_indexes()
+        
         # Initialize handlers
         handlers = TelegramHandlers()
+
+        # Preload known merchant categories so first hits skip the DB lookup
+        await handlers.ai_service.warm_category_cache()
         
-        # Create application
-        application = Application.builder().token(settings.telegram_token).build()
+        # Create application. concurrent_updates lets slow handlers (OCR,
+        # OpenAI) overlap across chats; same-chat races are covered by the
+        # per-user locks in TelegramHandlers.
+        application = (
+            Application.builder()
+            .token(settings.telegram_token)
+            .concurrent_updates(True)
+            .build()
+        )
         
-        # Reset and set commands
-        await application.bot.set_my_commands([])  # Clear old menu
-        await application.bot.set_my_commands([
-            BotCommand("start", "Start the bot"),
-            BotCommand("cancel", "Cancel current operation"),
-        ])
+        # set_my_commands replaces the whole menu, so no separate clear call
+        await application.bot.set_my_commands(_BOT_COMMANDS)
         
         # Add conversation handler for transaction recording
         conv_handler = ConversationHandler(
@@ -109,11 +139,21 @@ async def main():
             await application.updater.stop()
             await application.stop()
             await application.shutdown()
+            # Drain the pooled OpenAI HTTP/2 connections cleanly
+            await close_openai_client()
             
     except Exception as e:
         logger.error(f"❌ Failed to start bot: {e}")
         raise
 
+# The bot is purely I/O-bound, so the faster uvloop event loop shortens
+# every await; optional because it does not build on Windows
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    uvloop = None
+
 if __name__ == "__main__":
     # Suppress httpx info logs
     logging.getLogger("httpx").setLevel(logging.WARNING)